@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Benchmark of the structured-output parser on large rewrite outputs.
+
+Generates a synthetic rewrite output with many long articles, some with format drift,
+and compares the schema-driven parser with the previous line-by-line parser that
+built the content with repeated string concatenation.
+
+Benchmark do parser de saída estruturada em saídas grandes de reescrita.
+
+Gera uma saída sintética de reescrita com muitos artigos longos, alguns com desvios de
+formato, e compara o parser orientado a esquema com o parser anterior linha a linha que
+montava o conteúdo com concatenação repetida de strings.
+
+Usage / Uso:
+    python staff/src/staff/bench_structured_output.py [n_articles] [paragraphs]
+"""
+import sys
+import time
+from utilities.process_rewritten_article import process_rewritten_article
+
+
+def legacy_process_rewritten_article(result):
+    """
+    Previous parser, kept for comparison.
+    Parser anterior, mantido para comparação.
+    """
+    processed_articles = []
+    for article_text in result.strip().split('---ARTICLE DIVIDER---'):
+        if not article_text.strip():
+            continue
+        new_title = ''
+        new_content = ''
+        original_source = ''
+        current_section = None
+        for line in article_text.strip().split('\n'):
+            if line.startswith('NEW_TITLE:'):
+                current_section = 'title'
+                new_title = line.replace('NEW_TITLE:', '').strip()
+            elif line.startswith('NEW_CONTENT:'):
+                current_section = 'content'
+                new_content = line.replace('NEW_CONTENT:', '').strip()
+            elif line.startswith('ORIGINAL_SOURCE:'):
+                current_section = 'source'
+                original_source = line.replace('ORIGINAL_SOURCE:', '').strip()
+            elif current_section == 'content':
+                new_content += '\n' + line
+        if new_title:
+            processed_articles.append({'title': new_title, 'content': new_content, 'source': original_source})
+    return processed_articles
+
+
+def build_output(n_articles, paragraphs):
+    """
+    Synthetic rewrite output; every fifth article uses markdown-bolded labels.
+    Saída sintética de reescrita; a cada cinco artigos, um usa rótulos em negrito.
+    """
+    paragraph = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor. ' * 8
+    articles = []
+    for index in range(n_articles):
+        bold = '**' if index % 5 == 0 else ''
+        body = '\n\n'.join(paragraph for _ in range(paragraphs))
+        articles.append(
+            f"{bold}NEW_TITLE:{bold} Article {index}\n"
+            f"{bold}NEW_CONTENT:{bold} {body}\n"
+            f"{bold}ORIGINAL_SOURCE:{bold} site{index}.com - Title {index}\n"
+            "---ARTICLE DIVIDER---\n"
+        )
+    return ''.join(articles)
+
+
+def bench(function, output, repeat=5):
+    """
+    Best time over several runs and the number of parsed articles.
+    Melhor tempo em várias execuções e o número de artigos interpretados.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        articles = function(output)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(articles)
+
+
+if __name__ == '__main__':
+    n_articles = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    paragraphs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    output = build_output(n_articles, paragraphs)
+    size_mb = len(output.encode('utf-8')) / 1024 / 1024
+
+    print(f"Output: {n_articles} articles, {size_mb:.1f} MB")
+    for name, function in [('legacy', legacy_process_rewritten_article), ('structured', process_rewritten_article)]:
+        elapsed, parsed = bench(function, output)
+        print(f"  {name:<10} {elapsed * 1000:8.1f} ms  {size_mb / elapsed:6.1f} MB/s  {parsed}/{n_articles} articles")
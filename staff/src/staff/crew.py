@@ -11,6 +11,15 @@ class Staff():
     agents_config = 'config/agents.yaml'
     tasks_config = 'config/tasks.yaml'
 
+    # Model used by the agents, set by the model router
+    # Modelo usado pelos agentes, definido pelo roteador de modelos
+    def __init__(self, llm=None):
+        """
+        Set the model used by the agents before CrewBase builds and caches them; None keeps the crewAI default.
+        Define o modelo usado pelos agentes antes que o CrewBase os crie e armazene; None mantém o padrão do crewAI.
+        """
+        self.llm = llm
+
     # Content Rewriter Agent - Rewrites news articles in magazine style
     # Agente Reescritor de Conteúdo - Reescreve artigos de notícias no estilo de revista
     @agent
@@ -21,7 +30,8 @@ class Staff():
         """
         return Agent(
             config=self.agents_config['content_rewriter'],
-            verbose=False
+            verbose=False,
+            **({'llm': self.llm} if self.llm else {})
         )
 
     # Cover Designer Agent - Creates magazine cover content
@@ -34,7 +44,8 @@ class Staff():
         """
         return Agent(
             config=self.agents_config['cover_designer'],
-            verbose=False
+            verbose=False,
+            **({'llm': self.llm} if self.llm else {})
         )
 
     # Task to rewrite news articles into magazine format
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Offline evaluation of the cover digest against the full-article cover input.
+
+Runs the design crew twice per case, once with the full rewritten articles and once
+with the digest, and compares the processed cover content, latency and token usage.
+The eval set is a JSON list of cases with `topic`, `language` and `rewritten_articles`,
+e.g. process_data captured from the rewrite endpoint.
+
+Avaliação offline do resumo de capa em comparação com a entrada completa dos artigos.
+
+Executa a equipe de design duas vezes por caso, uma com os artigos reescritos completos
+e outra com o resumo, e compara o conteúdo da capa processado, a latência e o uso de tokens.
+O conjunto de avaliação é uma lista JSON de casos com `topic`, `language` e
+`rewritten_articles`, por exemplo process_data capturado do endpoint de reescrita.
+
+Usage / Uso:
+    python staff/src/staff/eval_cover_digest.py eval_set.json
+"""
+import json
+import sys
+import time
+from dotenv import load_dotenv
+from crew import Staff
+from utilities.cover_digest import build_cover_digest, estimate_tokens
+from utilities.process_cover_content import process_cover_content
+
+REQUIRED_KEYS = ['main_headline', 'subheading', 'main_article_index', 'summary1_index', 'summary1', 'summary2_index', 'summary2']
+
+
+def format_full_articles(rewritten_articles):
+    """
+    Format the complete rewritten articles, as the baseline cover input.
+    Formata os artigos reescritos completos, como entrada de referência da capa.
+    """
+    return ''.join(
+        f"INDEX:{index}\nTITLE:{article['title']}\nTEXT:{article['content']}\n---ARTICLE DIVIDER---\n"
+        for index, article in enumerate(rewritten_articles)
+    )
+
+
+def run_cover(case, articles_input):
+    """
+    Run the design crew for a case and return the cover content, latency and tokens.
+    Executa a equipe de design para um caso e retorna o conteúdo da capa, latência e tokens.
+    """
+    started = time.monotonic()
+    result = Staff().design_crew().kickoff(inputs={
+        'topic': case['topic'],
+        'n_news': len(case['rewritten_articles']),
+        'articles': articles_input,
+        'language': case['language'],
+    })
+    latency = time.monotonic() - started
+
+    usage = getattr(result, 'token_usage', None)
+    tokens = getattr(usage, 'total_tokens', None) or estimate_tokens(articles_input)
+    cover_content = process_cover_content(result.raw, n_articles=len(case['rewritten_articles']))
+    return cover_content, latency, tokens
+
+
+def is_valid(cover_content, n_articles):
+    """
+    Check that every field is present and the indices are distinct and in range.
+    Verifica se todos os campos estão presentes e os índices são distintos e válidos.
+    """
+    if any(key not in cover_content for key in REQUIRED_KEYS):
+        return False
+    indices = [cover_content['main_article_index'], cover_content['summary1_index'], cover_content['summary2_index']]
+    return len(set(indices)) == 3 and all(0 <= index < n_articles for index in indices)
+
+
+def evaluate(cases):
+    """
+    Compare full-input and digest cover generation over all cases and print a report.
+    Compara a geração de capa com entrada completa e com resumo em todos os casos e imprime um relatório.
+    """
+    totals = {'full_latency': 0.0, 'digest_latency': 0.0, 'full_tokens': 0, 'digest_tokens': 0,
+              'full_valid': 0, 'digest_valid': 0, 'same_main': 0, 'summary_overlap': 0.0}
+
+    for number, case in enumerate(cases):
+        n_articles = len(case['rewritten_articles'])
+        full, full_latency, full_tokens = run_cover(case, format_full_articles(case['rewritten_articles']))
+        digest, digest_latency, digest_tokens = run_cover(case, build_cover_digest(case['rewritten_articles']))
+
+        totals['full_latency'] += full_latency
+        totals['digest_latency'] += digest_latency
+        totals['full_tokens'] += full_tokens
+        totals['digest_tokens'] += digest_tokens
+        totals['full_valid'] += is_valid(full, n_articles)
+        totals['digest_valid'] += is_valid(digest, n_articles)
+        totals['same_main'] += full.get('main_article_index') == digest.get('main_article_index')
+
+        full_picks = {full.get('summary1_index'), full.get('summary2_index')} - {None}
+        digest_picks = {digest.get('summary1_index'), digest.get('summary2_index')} - {None}
+        if full_picks:
+            totals['summary_overlap'] += len(full_picks & digest_picks) / len(full_picks)
+
+        print(f"[{number}] {case['topic']} ({n_articles} articles): "
+              f"full {full_latency:.1f}s/{full_tokens} tokens, digest {digest_latency:.1f}s/{digest_tokens} tokens, "
+              f"main index {full.get('main_article_index')} vs {digest.get('main_article_index')}")
+
+    count = len(cases) or 1
+    print("\nSummary / Resumo")
+    print(f"  Valid covers:        full {totals['full_valid']}/{len(cases)}, digest {totals['digest_valid']}/{len(cases)}")
+    print(f"  Same main article:   {totals['same_main']}/{len(cases)}")
+    print(f"  Summary overlap:     {totals['summary_overlap'] / count:.0%}")
+    print(f"  Mean latency:        full {totals['full_latency'] / count:.1f}s, digest {totals['digest_latency'] / count:.1f}s")
+    print(f"  Mean tokens:         full {totals['full_tokens'] / count:.0f}, digest {totals['digest_tokens'] / count:.0f}")
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    if len(sys.argv) != 2:
+        print("Usage: python eval_cover_digest.py eval_set.json")
+        sys.exit(1)
+    with open(sys.argv[1], encoding='utf-8') as eval_file:
+        evaluate(json.load(eval_file))
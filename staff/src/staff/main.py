@@ -3,13 +3,24 @@ import os
 import types
 import warnings
 from datetime import datetime, timedelta
-from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
+from flask import Flask, jsonify
 from flask_cors import CORS
+from pydantic import ValidationError
 from crew import Staff
-from utilities.process_rewritten_article import process_rewritten_article
-from utilities.process_cover_content import process_cover_content
+from utilities.process_rewritten_article import process_rewritten_article, credited_articles
+from utilities.process_cover_content import process_cover_content, CoverContent
+from utilities.cover_digest import build_cover_digest
+from utilities.admission_control import AdmissionController
+from utilities.response_encoding import ResponseEncoder, RequestBodyError
+from utilities.model_router import ModelRouter
+from utilities.prewarm import (
+    PrewarmStore, RequestHistory, Prewarmer, freshness_seconds, REWARM_FRACTION,
+    translation_key, articles_key, image_key
+)
+from utilities.result_cache import ResultCache
+from utilities.news_search import canonical_url, source_domain, query_variants, date_windows, rank_results
 from google import genai
 from google.genai import types
 from PIL import Image
@@ -45,7 +56,8 @@ CORS(app, resources={
     r"/*": {
         "origins": ["*"],
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"],
+        "allow_headers": ["Content-Type", "Content-Encoding", "X-Request-Timeout"],
+        "expose_headers": ["Retry-After"],
         "max_age": 3600
     }
 })
@@ -65,9 +77,35 @@ subscriber = pubsub_v1.SubscriberClient()
 project_id = os.getenv('GOOGLE_CLOUD_PROJECT_ID')
 topic_path = publisher.topic_path(project_id, 'news-processing-topic')
 subscription_path = subscriber.subscription_path(project_id, 'news-processing-topic-sub')
-def translate_topic_to_english(topic):
+
+# Initialize admission control for the stage endpoints
+# Inicializa o controle de admissão para os endpoints das etapas
+admission = AdmissionController()
+
+# Initialize response encoding (fast JSON, compression, field selection)
+# Inicializa a codificação de respostas (JSON rápido, compressão, seleção de campos)
+encoder = ResponseEncoder(max_request_size=app.config['MAX_CONTENT_LENGTH'])
+
+# Initialize model routing per stage and coin tier
+# Inicializa o roteamento de modelos por etapa e faixa de moedas
+router = ModelRouter()
+
+# Initialize the prewarm store and the request history used to find hot topics
+# Inicializa o armazenamento de pré-aquecimento e o histórico usado para encontrar tópicos populares
+prewarm_store = PrewarmStore()
+request_history = RequestHistory()
+
+# Initialize the on-disk caches for rewritten articles and cover content; the cover
+# refers to articles by position, so its cache is keyed by the article order
+# Inicializa os caches em disco para artigos reescritos e conteúdo da capa; a capa
+# se refere aos artigos pela posição, então seu cache usa a ordem dos artigos
+rewrite_cache = ResultCache('rewrite', partial_ratio=0.75)
+cover_cache = ResultCache('cover', ordered=True)
+
+def translate_topic_to_english(topic, model='gemini-2.0-flash'):
     """
     Translate topic to English using Gemini AI if needed.
+    Traduz o tópico para inglês usando o Gemini AI, se necessário.
     """
     client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
     prompt = f"""If the following topic is not in English, translate it to English. If it's already in English, return only the original text.
@@ -75,10 +113,21 @@ def translate_topic_to_english(topic):
     Return only the translated or original text, nothing else."""
 
     response = client.models.generate_content(
-        model="gemini-2.0-flash", contents=prompt
+        model=model, contents=prompt
     )
     return response.text.strip()
 
+def complete_reask(prompt):
+    """
+    Answer a small targeted re-ask prompt for a missing or invalid output field.
+    Responde a uma pequena pergunta direcionada para um campo de saída ausente ou inválido.
+    """
+    client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY"))
+    response, _ = router.run('reask', None, lambda model: client.models.generate_content(
+        model=model, contents=prompt
+    ))
+    return response.text.strip()
+
 def get_news_parameters(coins):
     """
     Determine number of news articles and time period based on coins value.
@@ -96,7 +145,12 @@ def get_news_parameters(coins):
 def fetch_articles(topic, n_news, period):
     """
     Fetch news articles from Exa API based on topic and parameters.
+    FETCH_MODE selects a concurrent multi-query search ('fanout', default) or the
+    single search-and-contents query ('single').
+
     Busca artigos de notícias da API Exa com base no tópico e parâmetros.
+    FETCH_MODE seleciona uma busca paralela com várias consultas ('fanout', padrão)
+    ou a consulta única de busca e conteúdo ('single').
     """
     # Initialize Exa client with API key
     # Inicializa o cliente Exa com a chave de API
@@ -104,6 +158,31 @@ def fetch_articles(topic, n_news, period):
     if running_locally:
         print("Exa client initialized.")
 
+    if os.environ.get('FETCH_MODE', 'fanout') == 'single':
+        results = fetch_articles_single(exa, topic, n_news, period)
+    else:
+        results = fetch_articles_fanout(exa, topic, n_news, period)
+
+    # Process and format articles from search results
+    # Processa e formata os artigos dos resultados da pesquisa
+    articles = []
+    for result in results:
+        articles.append({
+            'title': result.title,
+            'url': result.url,
+            'text': result.text,
+            'source': source_domain(result.url)
+        })
+    
+    if running_locally:
+        print(f"Extracted articles.")
+    return articles
+
+def fetch_articles_single(exa, topic, n_news, period):
+    """
+    Search and download article texts with a single Exa query.
+    Busca e baixa os textos dos artigos com uma única consulta Exa.
+    """
     # Search for news articles with given parameters
     # Pesquisa artigos de notícias com os parâmetros fornecidos
     results = exa.search_and_contents(
@@ -118,33 +197,84 @@ def fetch_articles(topic, n_news, period):
     )
     if running_locally:
         print(f"Search results obtained.")
+    return results.results
 
-    # Process and format articles from search results
-    # Processa e formata os artigos dos resultados da pesquisa
-    articles = []
-    for result in results.results:
-        parsed_url = urlparse(result.url)
-        source_site = parsed_url.netloc.replace('www.', '')
-        
-        articles.append({
-            'title': result.title,
-            'url': result.url,
-            'text': result.text,
-            'source': source_site
-        })
-    
+def fetch_articles_fanout(exa, topic, n_news, period):
+    """
+    Run several query variants over date sub-windows concurrently with search-only calls,
+    merge and deduplicate the results, then download texts for the selected results in one
+    call. Results whose text cannot be downloaded are replaced by the next candidates in a
+    second call.
+
+    Executa várias variações de consulta em subjanelas de data em paralelo com chamadas
+    apenas de busca, mescla e remove duplicados, e baixa os textos dos resultados escolhidos
+    em uma única chamada. Resultados cujo texto não pode ser baixado são substituídos pelos
+    próximos candidatos em uma segunda chamada.
+    """
+    def search(query, start, end):
+        return exa.search(
+            query,
+            type="auto",
+            category="news",
+            num_results=n_news,
+            use_autoprompt=True,
+            start_published_date=start.strftime('%m/%d/%Y'),
+            end_published_date=end.strftime('%m/%d/%Y'),
+        ).results
+
+    # Search every query and window concurrently; a failed search only loses its own results
+    # Busca cada consulta e janela em paralelo; uma busca com falha perde apenas seus resultados
+    jobs = [(query, start, end) for start, end in date_windows(period) for query in query_variants(topic)]
+    result_lists = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = [executor.submit(search, *job) for job in jobs]
+        for future in futures:
+            try:
+                result_lists.append(future.result())
+            except Exception as e:
+                errors.append(e)
+    if not result_lists:
+        raise RuntimeError(f"All article searches failed: {errors[0]}")
+
+    candidates = rank_results(result_lists, n_news)
     if running_locally:
-        print(f"Extracted articles.")
+        print(f"Search results obtained: {sum(len(results) for results in result_lists)} hits from {len(jobs)} searches, {len(candidates)} unique.")
+
+    def download(batch):
+        # Match contents by result id, falling back to the URL, keeping the merged order
+        # Associa os conteúdos pelo id do resultado, com a URL como alternativa, mantendo a ordem mesclada
+        if not batch:
+            return []
+        contents = exa.get_contents([result.id for result in batch], text=True).results
+        by_id = {content.id: content for content in contents}
+        by_url = {canonical_url(content.url): content for content in contents}
+        downloaded = []
+        for result in batch:
+            content = by_id.get(result.id) or by_url.get(canonical_url(result.url))
+            if content is not None:
+                downloaded.append(content)
+        return downloaded
+
+    # Download texts only for the selected results, then backfill any that failed
+    # Baixa textos apenas dos resultados escolhidos e depois substitui os que falharam
+    articles = download(candidates[:n_news])
+    if len(articles) < n_news:
+        articles += download(candidates[n_news:n_news + n_news - len(articles)])
     return articles
 
-def rewrite_articles(articles, topic, n_news, language):
+def rewrite_articles(articles, topic, n_news, language, model=None, covered=()):
     """
     Rewrite articles using AI to create magazine-style content.
+    `covered` lists titles already in the magazine, whose stories are skipped.
+
     Reescreve artigos usando IA para criar conteúdo no estilo de revista.
+    `covered` lista títulos já presentes na revista, cujas notícias são ignoradas.
     """
-    # Initialize content crew from AI Staff
-    # Inicializa a equipe de conteúdo da IA Staff
-    content_crew = Staff().content_crew()
+    # Initialize content crew from AI Staff with the routed model
+    # Inicializa a equipe de conteúdo da IA Staff com o modelo roteado
+    staff = Staff(llm=model)
+    content_crew = staff.content_crew()
     if running_locally:
         print("Content crew initialized.")
     
@@ -160,7 +290,8 @@ def rewrite_articles(articles, topic, n_news, language):
         'topic': topic,
         'articles': full_articles_content,
         'n_news': str(n_news/2),  # Request half the number of articles / Solicita metade do número de artigos
-        'language': language
+        'language': language,
+        'covered': '\n'.join(covered) or 'None.'
     }    
     
     # Start the rewriting process
@@ -171,25 +302,31 @@ def rewrite_articles(articles, topic, n_news, language):
     
     # Process the raw output from AI
     # Processa a saída bruta da IA
-    return process_rewritten_article(rewrite_result.raw)
+    sources = '\n'.join(article['source'] + ' - ' + article['title'] for article in articles)
+    return process_rewritten_article(rewrite_result.raw, complete=complete_reask, sources=sources)
 
-def generate_cover_text(rewritten_articles, topic, language):
+def generate_cover_text(rewritten_articles, topic, language, model=None):
     """
     Create magazine cover content (titles, headlines) using AI.
     Cria conteúdo de capa de revista (títulos, manchetes) usando IA.
     """
-    # Initialize design crew from AI Staff
-    # Inicializa a equipe de design da IA Staff
-    design_crew = Staff().design_crew()
+    # Initialize design crew from AI Staff with the routed model
+    # Inicializa a equipe de design da IA Staff com o modelo roteado
+    staff = Staff(llm=model)
+    design_crew = staff.design_crew()
     if running_locally:
         print("Design crew initialized.")
     
+    # Condense the articles to index, title and lead so the prompt stays small
+    # Condensa os artigos em índice, título e abertura para manter o prompt pequeno
+    cover_digest = build_cover_digest(rewritten_articles)
+
     # Prepare input parameters for the AI
     # Prepara os parâmetros de entrada para a IA
     cover_inputs = {
         'topic': topic,
         'n_news': len(rewritten_articles),
-        'articles': rewritten_articles,
+        'articles': cover_digest,
         'language': language
     }
     
@@ -201,9 +338,90 @@ def generate_cover_text(rewritten_articles, topic, language):
     
     # Process the raw output from AI
     # Processa a saída bruta da IA
-    return process_cover_content(cover_result.raw)
+    return process_cover_content(
+        cover_result.raw, n_articles=len(rewritten_articles), complete=complete_reask, articles=cover_digest
+    )
+
+def rewrite_articles_cached(articles, topic, n_news, language, coins, proceed=None):
+    """
+    Rewrite articles through the rewrite cache, routing the crew call when needed.
+    On a partial hit, cached rewrites crediting an article that is no longer requested
+    are dropped and only the articles not covered by the rest are rewritten, with the
+    titles of the reused rewrites so the crew skips stories already covered.
+    Results are cached per primary model of the tier and only when that model produced them.
+    When `proceed(stage)` is given and refuses, returns (None, None) without calling the crew.
+
+    Reescreve artigos através do cache de reescrita, roteando a chamada da equipe quando necessário.
+    Em um acerto parcial, reescritas em cache que creditam um artigo não mais solicitado
+    são descartadas e apenas os artigos não cobertos pelas demais são reescritos, junto com
+    os títulos das reescritas reaproveitadas para que a equipe ignore notícias já cobertas.
+    Os resultados ficam em cache por modelo principal da faixa e apenas quando gerados por ele.
+    Quando `proceed(stage)` é informado e recusa, retorna (None, None) sem chamar a equipe.
+    """
+    # The whole article set picks the tier, so a partial rewrite uses the same models
+    # O conjunto completo de artigos escolhe a faixa, então uma reescrita parcial usa os mesmos modelos
+    input_chars = sum(len(article.get('text') or '') for article in articles)
+    primary_model = router.primary('rewrite', coins, input_chars)
+    scope = (topic, language, n_news, primary_model)
+    cached, missing = rewrite_cache.lookup(scope, articles)
+    if cached is not None and not missing:
+        return cached, {'stage': 'rewrite', 'reason': 'cached'}
+    if proceed is not None and not proceed('rewrite'):
+        return None, None
+
+    # Scale the requested article count to the share of articles being rewritten
+    # Ajusta a quantidade de artigos solicitada à parcela de artigos sendo reescrita
+    covered = [article['title'] for article in cached or []]
+    rewritten_articles, routing = router.run(
+        'rewrite', coins, lambda model: rewrite_articles(
+            missing, topic, n_news * len(missing) / len(articles), language, model, covered
+        ),
+        input_chars=input_chars
+    )
+    if cached is not None:
+        rewritten_articles = cached + rewritten_articles
+        routing['cache'] = 'partial'
+
+    # Results of a fallback model are served but not cached
+    # Resultados de um modelo de fallback são servidos mas não ficam em cache
+    if rewritten_articles and routing['model'] == primary_model:
+        provenance = [credited_articles(article, articles) for article in rewritten_articles]
+        rewrite_cache.store(scope, articles, rewritten_articles, provenance)
+    return rewritten_articles, routing
 
-def generate_cover_image(topic):
+def generate_cover_text_cached(rewritten_articles, topic, language, coins, proceed=None):
+    """
+    Create cover content through the cover cache, routing the crew call when needed.
+    Covers are cached per primary model of the tier and only when that model produced them.
+    When `proceed(stage)` is given and refuses, returns (None, None) without calling the crew.
+
+    Cria o conteúdo da capa através do cache de capa, roteando a chamada da equipe quando necessário.
+    As capas ficam em cache por modelo principal da faixa e apenas quando geradas por ele.
+    Quando `proceed(stage)` é informado e recusa, retorna (None, None) sem chamar a equipe.
+    """
+    primary_model = router.primary('cover', coins)
+    scope = (topic, language, primary_model)
+    cached, _ = cover_cache.lookup(scope, rewritten_articles)
+    if cached is not None:
+        return cached, {'stage': 'cover', 'reason': 'cached'}
+    if proceed is not None and not proceed('cover'):
+        return None, None
+
+    cover_content, routing = router.run(
+        'cover', coins, lambda model: generate_cover_text(rewritten_articles, topic, language, model)
+    )
+    # Only complete, validated covers from the primary model are cached; others are served once and regenerated
+    # Apenas capas completas e validadas do modelo principal ficam em cache; as demais são servidas uma vez e regeneradas
+    if routing['model'] != primary_model:
+        return cover_content, routing
+    try:
+        CoverContent.model_validate(cover_content, context={'n_articles': len(rewritten_articles)})
+    except ValidationError:
+        return cover_content, routing
+    cover_cache.store(scope, rewritten_articles, cover_content)
+    return cover_content, routing
+
+def generate_cover_image(topic, model='imagen-3.0-generate-002'):
     """
     Generate magazine cover image using Google's Imagen AI.
     Gera imagem de capa de revista usando a IA Imagen do Google.
@@ -219,7 +437,7 @@ def generate_cover_image(topic):
         # Generate image with Imagen model
         # Gera imagem com o modelo Imagen
         response = client.models.generate_images(
-            model='imagen-3.0-generate-002',
+            model=model,
             prompt=base_prompt,
             config=types.GenerateImagesConfig(
                 number_of_images=1,
@@ -260,26 +478,101 @@ def create_magazine_raw_data(language, topic, period, rewritten_articles, cover_
         'cover_image': cover_image,
     }
 
+def prewarm_magazine(topic, language, coins, proceed):
+    """
+    Precompute every stage of a magazine into the prewarm store and result caches.
+    Articles are fetched again once older than the rewarm point so news stays fresh, and
+    reused when a previous attempt yielded after fetching them; rewrites and cover text
+    are reused from the caches while the article set is unchanged. Returns False when it
+    yielded before finishing.
+
+    Pré-calcula todas as etapas de uma revista no armazenamento de pré-aquecimento e nos caches.
+    Os artigos são buscados novamente quando passam do ponto de reaquecimento, para manter
+    as notícias atuais, e reaproveitados quando uma tentativa anterior cedeu a vez depois de
+    buscá-los; reescritas e texto da capa são reaproveitados dos caches enquanto o conjunto
+    de artigos não muda. Retorna False quando cedeu a vez antes de terminar.
+    """
+    n_news, period = get_news_parameters(coins)
+    ttl = freshness_seconds(coins)
+
+    def warm(key, stage, compute, max_age=None):
+        # Reuse a result stored within max_age or compute it if allowed. Reused results keep
+        # their freshness deadline, except those without max_age (the topic translation,
+        # which does not go stale), whose freshness is extended on purpose
+        # Reaproveita um resultado armazenado dentro de max_age ou calcula se permitido. Resultados
+        # reaproveitados mantêm o prazo de validade, exceto os sem max_age (a tradução do tópico,
+        # que não fica desatualizada), cuja validade é estendida de propósito
+        value = prewarm_store.get(key, max_age)
+        if value is None:
+            if not proceed(stage):
+                return None
+            value = compute()
+        elif max_age is not None:
+            return value
+        prewarm_store.put(key, value, ttl)
+        return value
+
+    english_topic = warm(translation_key(topic), 'translate', lambda: router.run(
+        'translate', coins, lambda model: translate_topic_to_english(topic, model), input_chars=len(topic)
+    )[0])
+    if english_topic is None:
+        return False
+
+    articles = warm(articles_key(english_topic, n_news, period), 'fetch',
+                    lambda: fetch_articles(english_topic, n_news, period), max_age=ttl * REWARM_FRACTION)
+    if articles is None:
+        return False
+
+    rewritten_articles, _ = rewrite_articles_cached(articles, english_topic, n_news, language, coins, proceed)
+    if rewritten_articles is None:
+        return False
+
+    cover_content, _ = generate_cover_text_cached(rewritten_articles, english_topic, language, coins, proceed)
+    if cover_content is None:
+        return False
+
+    cover_image = warm(image_key(english_topic, coins), 'image', lambda: router.run(
+        'image', coins, lambda model: generate_cover_image(english_topic, model)
+    )[0], max_age=ttl * REWARM_FRACTION)
+    return cover_image is not None
+
+# Start the prewarming scheduler when enabled
+# Inicia o agendador de pré-aquecimento quando habilitado
+prewarmer = Prewarmer(request_history, admission, prewarm_magazine)
+if os.environ.get('PREWARM_ENABLED', 'false').lower() == 'true':
+    prewarmer.start()
+
 # API ROUTES / ROTAS DA API
 
 # Step 1: Initialize magazine creation process
 # Passo 1: Inicializa o processo de criação da revista
 @app.route('/init-magazine-process-endpoint/<language>/<topic>/<coins>')
+@admission.limit('init')
 def init_magazine_process_endpoint(language, topic, coins):
     """
     Initialize the magazine creation process with basic parameters.
     Inicializa o processo de criação da revista com parâmetros básicos.
     """
     try:
-        # Translate topic to English
-        english_topic = translate_topic_to_english(topic)
-        if running_locally:
-            print(f"Topic translated: {english_topic}")
-            
         # Get article parameters based on coins
         n_news, period = get_news_parameters(coins)
         if running_locally:
             print(f"Inputs prepared: n_news={n_news}, period={period}")
+
+        # Record the request so popular topics can be prewarmed
+        request_history.record(topic, language, coins)
+
+        # Translate topic to English with the routed model, unless already prewarmed
+        english_topic = prewarm_store.get(translation_key(topic))
+        if english_topic is not None:
+            routing = {'stage': 'translate', 'reason': 'prewarmed'}
+            admission.skip_latency()
+        else:
+            english_topic, routing = router.run(
+                'translate', coins, lambda model: translate_topic_to_english(topic, model), input_chars=len(topic)
+            )
+        if running_locally:
+            print(f"Topic translated: {english_topic}")
         
         # Create initial process data
         process_data = {
@@ -291,9 +584,10 @@ def init_magazine_process_endpoint(language, topic, coins):
             'status': 'initialized'
         }
         
-        return jsonify({
+        return encoder.respond({
             'process_data': process_data,
             'status': 'initialized',
+            'routing': routing,
             'next_step': f'/api/magazine/fetch-articles'
         })
         
@@ -305,6 +599,7 @@ def init_magazine_process_endpoint(language, topic, coins):
 # Step 2: Fetch news articles
 # Passo 2: Busca artigos de notícias
 @app.route('/fetch-articles-endpoint', methods=['POST'])
+@admission.limit('fetch')
 def fetch_articles_endpoint():
     """
     Fetch relevant news articles based on the topic and parameters.
@@ -313,7 +608,7 @@ def fetch_articles_endpoint():
     try:
         # Get process data from request
         # Obtém dados do processo da requisição
-        process_data = request.json.get('process_data', {})
+        process_data = encoder.read_json().get('process_data', {})
         if not process_data:
             return jsonify({'error': 'Missing process data'}), 400
         
@@ -328,9 +623,15 @@ def fetch_articles_endpoint():
         if not all([topic, n_news, period]):
             return jsonify({'error': 'Missing required parameters'}), 400
         
-        # Fetch articles from news sources
-        # Busca artigos de fontes de notícias
-        articles = fetch_articles(topic, n_news, period)
+        # Fetch articles from news sources, unless already prewarmed
+        # Busca artigos de fontes de notícias, a menos que já estejam pré-aquecidos
+        articles = prewarm_store.get(articles_key(topic, n_news, period))
+        if articles is not None:
+            routing = {'stage': 'fetch', 'reason': 'prewarmed'}
+            admission.skip_latency()
+        else:
+            articles = fetch_articles(topic, n_news, period)
+            routing = {'stage': 'fetch', 'reason': 'fetched', 'mode': os.environ.get('FETCH_MODE', 'fanout')}
         
         # Update process data with articles
         # Atualiza dados do processo com os artigos
@@ -339,13 +640,16 @@ def fetch_articles_endpoint():
         
         # Return updated process data and next step
         # Retorna dados do processo atualizados e próximo passo
-        return jsonify({
+        return encoder.respond({
             'process_data': process_data,
             'status': 'articles_fetched',
             'article_count': len(articles),
+            'routing': routing,
             'next_step': f'/api/magazine/rewrite-articles'
-        })
+        }, added=['articles'])
         
+    except RequestBodyError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         if running_locally:
             print(f"Article fetching error: {e}")
@@ -354,6 +658,7 @@ def fetch_articles_endpoint():
 # Step 3: Rewrite articles for magazine style
 # Passo 3: Reescreve artigos no estilo de revista
 @app.route('/rewrite-articles-endpoint', methods=['POST'])
+@admission.limit('rewrite')
 def rewrite_articles_endpoint():
     """
     Rewrite news articles in magazine style using AI.
@@ -362,7 +667,7 @@ def rewrite_articles_endpoint():
     try:
         # Get process data from request
         # Obtém dados do processo da requisição
-        process_data = request.json.get('process_data', {})
+        process_data = encoder.read_json().get('process_data', {})
         if not process_data:
             return jsonify({'error': 'Missing process data'}), 400
         
@@ -372,15 +677,18 @@ def rewrite_articles_endpoint():
         topic = process_data.get('topic')
         n_news = process_data.get('n_news')
         language = process_data.get('language')
+        coins = process_data.get('coins')
         
         # Validate required parameters
         # Valida parâmetros necessários
         if not all([articles, topic, n_news, language]):
             return jsonify({'error': 'Missing required parameters'}), 400
         
-        # Rewrite articles using AI
-        # Reescreve artigos usando IA
-        rewritten_articles = rewrite_articles(articles, topic, n_news, language)
+        # Rewrite articles using AI with the routed model, reusing cached rewrites
+        # Reescreve artigos usando IA com o modelo roteado, reaproveitando reescritas em cache
+        rewritten_articles, routing = rewrite_articles_cached(articles, topic, n_news, language, coins)
+        if routing['reason'] == 'cached':
+            admission.skip_latency()
         
         # Update process data with rewritten articles
         # Atualiza dados do processo com os artigos reescritos
@@ -389,13 +697,16 @@ def rewrite_articles_endpoint():
         
         # Return updated process data and next step
         # Retorna dados do processo atualizados e próximo passo
-        return jsonify({
+        return encoder.respond({
             'process_data': process_data,
             'status': 'articles_rewritten',
             'rewritten_count': len(rewritten_articles),
+            'routing': routing,
             'next_step': f'/api/magazine/create-cover'
-        })
+        }, added=['rewritten_articles'])
         
+    except RequestBodyError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         if running_locally:
             print(f"Article rewriting error: {e}")
@@ -404,6 +715,7 @@ def rewrite_articles_endpoint():
 # Step 4: Create magazine cover content
 # Passo 4: Cria conteúdo da capa da revista
 @app.route('/generate-cover-text-endpoint', methods=['POST'])
+@admission.limit('cover')
 def generate_cover_text_endpoint():
     """
     Create magazine cover content (title, subtitle, highlights) using AI.
@@ -412,7 +724,7 @@ def generate_cover_text_endpoint():
     try:
         # Get process data from request
         # Obtém dados do processo da requisição
-        process_data = request.json.get('process_data', {})
+        process_data = encoder.read_json().get('process_data', {})
         if not process_data:
             return jsonify({'error': 'Missing process data'}), 400
         
@@ -421,15 +733,18 @@ def generate_cover_text_endpoint():
         rewritten_articles = process_data.get('rewritten_articles')
         topic = process_data.get('topic')
         language = process_data.get('language')
+        coins = process_data.get('coins')
         
         # Validate required parameters
         # Valida parâmetros necessários
         if not all([rewritten_articles, topic, language]):
             return jsonify({'error': 'Missing required parameters'}), 400
         
-        # Create cover content using AI
-        # Cria conteúdo da capa usando IA
-        cover_content = generate_cover_text(rewritten_articles, topic, language)
+        # Create cover content using AI with the routed model, reusing cached covers
+        # Cria conteúdo da capa usando IA com o modelo roteado, reaproveitando capas em cache
+        cover_content, routing = generate_cover_text_cached(rewritten_articles, topic, language, coins)
+        if routing['reason'] == 'cached':
+            admission.skip_latency()
         
         # Update process data with cover content
         # Atualiza dados do processo com o conteúdo da capa
@@ -438,12 +753,15 @@ def generate_cover_text_endpoint():
         
         # Return updated process data and next step
         # Retorna dados do processo atualizados e próximo passo
-        return jsonify({
+        return encoder.respond({
             'process_data': process_data,
             'status': 'cover_created',
+            'routing': routing,
             'next_step': f'/api/magazine/generate-image'
-        })
+        }, added=['cover_content'])
         
+    except RequestBodyError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         if running_locally:
             print(f"Cover creation error: {e}")
@@ -452,6 +770,7 @@ def generate_cover_text_endpoint():
 # Step 5: Generate magazine cover image
 # Passo 5: Gera imagem da capa da revista
 @app.route('/generate-image-endpoint', methods=['POST'])
+@admission.limit('image')
 def generate_image_endpoint():
     """
     Generate magazine cover image using AI image generation.
@@ -460,22 +779,30 @@ def generate_image_endpoint():
     try:
         # Get process data from request
         # Obtém dados do processo da requisição
-        process_data = request.json.get('process_data', {})
+        process_data = encoder.read_json().get('process_data', {})
         if not process_data:
             return jsonify({'error': 'Missing process data'}), 400
         
         # Extract topic parameter
         # Extrai parâmetro de tópico
         topic = process_data.get('topic')
+        coins = process_data.get('coins')
         
         # Validate topic parameter
         # Valida parâmetro de tópico
         if not topic:
             return jsonify({'error': 'Missing required parameter: topic'}), 400
         
-        # Generate cover image with AI
-        # Gera imagem da capa com IA
-        cover_image = generate_cover_image(topic)
+        # Generate cover image with AI using the routed model, unless already prewarmed
+        # Gera imagem da capa com IA usando o modelo roteado, a menos que já esteja pré-aquecida
+        cover_image = prewarm_store.get(image_key(topic, coins))
+        if cover_image is not None:
+            routing = {'stage': 'image', 'reason': 'prewarmed'}
+            admission.skip_latency()
+        else:
+            cover_image, routing = router.run(
+                'image', coins, lambda model: generate_cover_image(topic, model)
+            )
         
         # Update process data with cover image
         # Atualiza dados do processo com a imagem da capa
@@ -484,12 +811,15 @@ def generate_image_endpoint():
         
         # Return updated process data and next step
         # Retorna dados do processo atualizados e próximo passo
-        return jsonify({
+        return encoder.respond({
             'process_data': process_data,
             'status': 'image_generated',
+            'routing': routing,
             'next_step': f'/api/magazine/finalize'
-        })
+        }, added=['cover_image'])
         
+    except RequestBodyError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         if running_locally:
             print(f"Image generation error: {e}")
@@ -498,6 +828,7 @@ def generate_image_endpoint():
 # Step 6: Finalize and return the magazine
 # Passo 6: Finaliza e retorna a revista
 @app.route('/finalize-magazine-raw-data-endpoint', methods=['POST'])
+@admission.limit('finalize')
 def finalize_magazine_raw_data_endpoint():
     """
     Finalize the magazine creation and return the complete magazine data.
@@ -506,7 +837,7 @@ def finalize_magazine_raw_data_endpoint():
     try:
         # Get process data from request
         # Obtém dados do processo da requisição
-        process_data = request.json.get('process_data', {})
+        process_data = encoder.read_json().get('process_data', {})
         if not process_data:
             return jsonify({'error': 'Missing process data'}), 400
         
@@ -533,16 +864,37 @@ def finalize_magazine_raw_data_endpoint():
         
         # Return only the magazine data and success status
         # Retorna apenas os dados da revista e status de sucesso
-        return jsonify({
+        return encoder.respond({
             'magazine_data': magazine_data,
             'status': 'success'
         })
         
+    except RequestBodyError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         if running_locally:
             print(f"Finalization error: {e}")
         return jsonify({'error': str(e)}), 500
 
+# Report admission control, encoding, model routing, prewarm and cache counters
+# Reporta os contadores do controle de admissão, da codificação, do roteamento, do pré-aquecimento e dos caches
+@app.route('/metrics-endpoint')
+def metrics_endpoint():
+    """
+    Return runtime metrics for monitoring and load tests.
+    Retorna métricas de execução para monitoramento e testes de carga.
+    """
+    return jsonify({
+        'admission': admission.snapshot(),
+        'encoding': encoder.snapshot(),
+        'routing': router.snapshot(),
+        'prewarm': dict(prewarmer.snapshot(), store=prewarm_store.snapshot()),
+        'cache': {
+            'rewrite': rewrite_cache.snapshot(),
+            'cover': cover_cache.snapshot()
+        }
+    })
+
 # Run the Flask application
 # Executa a aplicação Flask
 if __name__ == '__main__':
@@ -0,0 +1,326 @@
+import math
+import os
+import socket
+import threading
+import time
+from functools import wraps
+from itertools import count
+from flask import g, request, jsonify
+from globals import running_locally
+
+# Default limits per stage: (max in-flight, max queued, initial latency estimate in seconds)
+# Limites padrão por etapa: (máximo em execução, máximo na fila, estimativa inicial de latência em segundos)
+DEFAULT_STAGE_LIMITS = {
+    'init': (4, 4, 2.0),
+    'fetch': (3, 4, 10.0),
+    'rewrite': (2, 2, 120.0),
+    'cover': (2, 3, 30.0),
+    'image': (2, 3, 15.0),
+    'finalize': (4, 8, 0.5),
+}
+
+# How often queued requests re-check their deadline and connection (seconds)
+# Frequência com que requisições na fila verificam prazo e conexão (segundos)
+POLL_INTERVAL = 0.5
+
+# Weight of the newest sample in the latency moving average
+# Peso da amostra mais recente na média móvel de latência
+LATENCY_SMOOTHING = 0.2
+
+
+def _status(response):
+    """
+    HTTP status of a view's return value; 500 when the view raised.
+    Status HTTP do valor retornado por uma view; 500 quando a view lançou exceção.
+    """
+    if response is None:
+        return 500
+    if isinstance(response, tuple):
+        return response[1] if len(response) > 1 and isinstance(response[1], int) else 200
+    return getattr(response, 'status_code', 200)
+
+
+class _StageState:
+    """
+    Mutable counters and limits for a single stage.
+    Contadores e limites mutáveis de uma única etapa.
+    """
+    def __init__(self, max_in_flight, max_queue, latency):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.latency = latency
+        self.in_flight = 0
+        self.waiting = []
+        self.admitted = 0
+        self.shed = 0
+        self.expired = 0
+        self.abandoned = 0
+        self.completed = 0
+
+
+class AdmissionController:
+    """
+    Admission control and load shedding for the magazine stage endpoints.
+    Tracks in-flight work per stage, caps queue depth and rejects excess requests
+    with 429 and a Retry-After computed from the observed stage latency. Queued
+    requests are served earliest-deadline-first and dropped before doing any work
+    if their deadline passes or their client disconnects.
+
+    Controle de admissão e descarte de carga para os endpoints das etapas da revista.
+    Acompanha o trabalho em execução por etapa, limita a profundidade da fila e rejeita
+    requisições excedentes com 429 e um Retry-After calculado a partir da latência
+    observada da etapa. Requisições na fila são atendidas por prazo mais curto primeiro
+    e descartadas antes de qualquer trabalho se o prazo expirar ou o cliente desconectar.
+    """
+    def __init__(self, limits=None, capacity=None):
+        limits = limits or DEFAULT_STAGE_LIMITS
+        self._cond = threading.Condition()
+        self._sequence = count()
+        self._stages = {
+            stage: _StageState(max_in_flight, max_queue, latency)
+            for stage, (max_in_flight, max_queue, latency) in limits.items()
+        }
+
+        # Requests parked in the queue still hold a gunicorn thread, so the total
+        # occupancy is capped below the thread count to keep one thread for cheap calls
+        # Requisições na fila ainda ocupam uma thread do gunicorn, então a ocupação total
+        # é limitada abaixo do número de threads para manter uma thread livre
+        if capacity is None:
+            capacity = int(os.environ.get('ADMISSION_CAPACITY', int(os.environ.get('WORKER_THREADS', 8)) - 1))
+        self.capacity = max(1, capacity)
+
+        # Slots held by background work (prewarming), counted against the capacity
+        # Vagas ocupadas por trabalho em segundo plano (pré-aquecimento), contadas na capacidade
+        self.background = 0
+
+    def limit(self, stage):
+        """
+        Decorator that puts a Flask view behind the admission controller for the given stage.
+        Decorador que coloca uma view Flask atrás do controle de admissão para a etapa informada.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Buffer the body first: unread body bytes would keep the disconnect peek from ever seeing EOF
+                # Armazena o corpo antes: bytes não lidos impediriam a verificação de desconexão de ver o EOF
+                request.get_data()
+                rejection = self._acquire(stage, self._request_deadline())
+                if rejection is not None:
+                    return rejection
+
+                started = time.monotonic()
+                response = None
+                try:
+                    response = view(*args, **kwargs)
+                    return response
+                finally:
+                    # Only successful responses that did the stage's work feed the latency estimate
+                    # Apenas respostas bem-sucedidas que fizeram o trabalho da etapa alimentam a estimativa de latência
+                    did_work = _status(response) < 300 and not g.get('admission_skip_latency', False)
+                    self._release(stage, time.monotonic() - started if did_work else None)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def skip_latency():
+        """
+        Mark the current request as not representative of the stage latency (e.g. served from a cache).
+        Marca a requisição atual como não representativa da latência da etapa (ex.: servida de um cache).
+        """
+        g.admission_skip_latency = True
+
+    def idle(self):
+        """
+        Whether no stage request is running or queued, so background work may use the capacity.
+        Se nenhuma requisição de etapa está em execução ou na fila, permitindo trabalho em segundo plano.
+        """
+        with self._cond:
+            return self._live() == 0
+
+    def reserve_background(self):
+        """
+        Take a capacity slot for background work if no stage request is running or queued.
+        While held, live requests are admitted against the remaining capacity.
+        Returns whether the slot was taken.
+
+        Ocupa uma vaga da capacidade para trabalho em segundo plano se nenhuma requisição de
+        etapa está em execução ou na fila. Enquanto ocupada, requisições ao vivo são admitidas
+        com a capacidade restante. Retorna se a vaga foi ocupada.
+        """
+        with self._cond:
+            if self._live() > 0 or self._occupied() >= self.capacity:
+                return False
+            self.background += 1
+            return True
+
+    def release_background(self):
+        """
+        Free a slot taken by reserve_background.
+        Libera uma vaga ocupada por reserve_background.
+        """
+        with self._cond:
+            self.background -= 1
+            self._cond.notify_all()
+
+    def snapshot(self):
+        """
+        Return the current counters of every stage for the metrics endpoint.
+        Retorna os contadores atuais de cada etapa para o endpoint de métricas.
+        """
+        with self._cond:
+            return {
+                'capacity': self.capacity,
+                'occupied': self._occupied(),
+                'background': self.background,
+                'stages': {
+                    stage: {
+                        'in_flight': state.in_flight,
+                        'queued': len(state.waiting),
+                        'max_in_flight': state.max_in_flight,
+                        'max_queue': state.max_queue,
+                        'latency_seconds': round(state.latency, 3),
+                        'admitted': state.admitted,
+                        'completed': state.completed,
+                        'shed': state.shed,
+                        'expired': state.expired,
+                        'abandoned': state.abandoned,
+                    }
+                    for stage, state in self._stages.items()
+                },
+            }
+
+    def _acquire(self, stage, deadline):
+        """
+        Admit, queue or reject a request. Returns None when admitted, otherwise a Flask response.
+        Admite, enfileira ou rejeita uma requisição. Retorna None quando admitida, senão uma resposta Flask.
+        """
+        state = self._stages[stage]
+        with self._cond:
+            # Fast path: free slot and nobody ahead in the queue
+            # Caminho rápido: vaga livre e ninguém à frente na fila
+            if state.in_flight < state.max_in_flight and not state.waiting and self._occupied() < self.capacity:
+                state.in_flight += 1
+                state.admitted += 1
+                return None
+
+            # Shed when the queue is full or the request could not finish before its deadline
+            # Descarta quando a fila está cheia ou a requisição não terminaria antes do prazo
+            expected_finish = time.monotonic() + self._expected_wait(state) + state.latency
+            if (len(state.waiting) >= state.max_queue or self._occupied() >= self.capacity
+                    or (deadline is not None and expected_finish > deadline)):
+                state.shed += 1
+                retry_after = self._retry_after(state)
+                outcome = 'shed'
+            else:
+                ticket = (deadline if deadline is not None else math.inf, next(self._sequence))
+                state.waiting.append(ticket)
+                try:
+                    outcome = self._wait_for_slot(state, ticket, deadline)
+                finally:
+                    state.waiting.remove(ticket)
+                    self._cond.notify_all()
+                if outcome == 'admitted':
+                    return None
+
+        if running_locally:
+            print(f"Admission control: {stage} request {outcome}.")
+
+        if outcome == 'shed':
+            response = jsonify({'error': f'Server busy, {stage} stage is at capacity', 'status': 'overloaded'})
+            response.headers['Retry-After'] = str(retry_after)
+            return response, 429
+        if outcome == 'expired':
+            return jsonify({'error': 'Request deadline exceeded while queued', 'status': 'expired'}), 504
+        return jsonify({'error': 'Client disconnected while queued', 'status': 'abandoned'}), 499
+
+    def _wait_for_slot(self, state, ticket, deadline):
+        """
+        Block until the ticket is first in line and a slot is free. Must hold the condition lock.
+        Bloqueia até o ticket ser o primeiro da fila e haver vaga. Deve ser chamado com o lock.
+        """
+        while True:
+            if state.in_flight < state.max_in_flight and min(state.waiting) == ticket:
+                state.in_flight += 1
+                state.admitted += 1
+                return 'admitted'
+            if deadline is not None and time.monotonic() >= deadline:
+                state.expired += 1
+                return 'expired'
+            if self._client_disconnected():
+                state.abandoned += 1
+                return 'abandoned'
+            self._cond.wait(timeout=POLL_INTERVAL)
+
+    def _release(self, stage, elapsed):
+        """
+        Free a slot and fold the observed latency, unless None, into the stage average.
+        Libera uma vaga e incorpora a latência observada, exceto None, na média da etapa.
+        """
+        state = self._stages[stage]
+        with self._cond:
+            state.in_flight -= 1
+            state.completed += 1
+            if elapsed is not None:
+                state.latency += LATENCY_SMOOTHING * (elapsed - state.latency)
+            self._cond.notify_all()
+
+    def _occupied(self):
+        """
+        Number of request threads held by admitted or queued work, plus background slots.
+        Número de threads ocupadas por trabalho admitido ou na fila, mais vagas em segundo plano.
+        """
+        return self._live() + self.background
+
+    def _live(self):
+        """
+        Number of request threads held by admitted or queued stage requests.
+        Número de threads ocupadas por requisições de etapa admitidas ou na fila.
+        """
+        return sum(state.in_flight + len(state.waiting) for state in self._stages.values())
+
+    def _expected_wait(self, state):
+        """
+        Estimated queueing time for a new request given the stage latency.
+        Tempo estimado de fila para uma nova requisição dada a latência da etapa.
+        """
+        ahead = len(state.waiting) + max(0, state.in_flight - state.max_in_flight + 1)
+        return state.latency * ahead / state.max_in_flight
+
+    def _retry_after(self, state):
+        """
+        Seconds a rejected client should wait before retrying.
+        Segundos que um cliente rejeitado deve aguardar antes de tentar novamente.
+        """
+        return max(1, math.ceil(state.latency * (len(state.waiting) + 1) / state.max_in_flight))
+
+    @staticmethod
+    def _request_deadline():
+        """
+        Absolute deadline from the optional X-Request-Timeout header (seconds the client will wait).
+        Prazo absoluto a partir do header opcional X-Request-Timeout (segundos que o cliente aguarda).
+        """
+        timeout = request.headers.get('X-Request-Timeout')
+        if not timeout:
+            return None
+        try:
+            return time.monotonic() + float(timeout)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _client_disconnected():
+        """
+        Check whether the client closed its connection, when running under gunicorn.
+        The request body must already be read, otherwise the peek returns body bytes.
+        Verifica se o cliente fechou a conexão, quando executando sob o gunicorn.
+        O corpo da requisição já deve ter sido lido, senão a verificação retorna bytes do corpo.
+        """
+        sock = request.environ.get('gunicorn.socket')
+        if sock is None:
+            return False
+        try:
+            return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b''
+        except (BlockingIOError, InterruptedError):
+            return False
+        except OSError:
+            return True
@@ -0,0 +1,95 @@
+import os
+import re
+from globals import running_locally
+
+# Default token budget for the whole digest sent to the cover designer
+# Orçamento padrão de tokens para todo o resumo enviado ao designer de capa
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Rough characters-per-token ratio used to estimate prompt size
+# Proporção aproximada de caracteres por token usada para estimar o tamanho do prompt
+CHARS_PER_TOKEN = 4
+
+# Characters taken by the labels and divider of each digest entry
+# Caracteres ocupados pelos rótulos e pelo divisor de cada entrada do resumo
+ENTRY_OVERHEAD = len('INDEX:00\nTITLE:\nLEAD:\n---ARTICLE DIVIDER---\n')
+
+# Sentence boundary: terminal punctuation followed by whitespace
+# Limite de frase: pontuação final seguida de espaço
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text.
+    Estima o número de tokens de um texto.
+    """
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def lead_sentences(content: str, max_chars: int) -> str:
+    """
+    Return the opening sentences of an article that fit in max_chars.
+    At least part of the first sentence is always returned.
+
+    Retorna as frases iniciais de um artigo que cabem em max_chars.
+    Pelo menos parte da primeira frase é sempre retornada.
+    """
+    paragraphs = [paragraph.strip() for paragraph in content.split('\n') if paragraph.strip()]
+    sentences = SENTENCE_BOUNDARY.split(' '.join(paragraphs))
+
+    lead = []
+    used = 0
+    for sentence in sentences:
+        if used + len(sentence) > max_chars:
+            break
+        lead.append(sentence)
+        used += len(sentence) + 1
+
+    if not lead and sentences:
+        # First sentence alone exceeds the budget: cut it at a word boundary
+        # A primeira frase sozinha excede o orçamento: corta em um limite de palavra
+        return sentences[0][:max_chars].rsplit(' ', 1)[0] + '…'
+    return ' '.join(lead)
+
+
+def build_cover_digest(rewritten_articles: list, token_budget: int = None) -> str:
+    """
+    Condense rewritten articles into index, title and lead sentences for the cover designer.
+    The budget is split evenly across articles so every article stays selectable.
+
+    Parameters:
+    - rewritten_articles: List of rewritten article dictionaries (title, content, source)
+    - token_budget: Approximate token budget for the whole digest
+
+    Returns:
+    - Digest text in the same INDEX/TITLE layout used for the rewrite input
+
+    Condensa os artigos reescritos em índice, título e frases iniciais para o designer de capa.
+    O orçamento é dividido igualmente entre os artigos para que todos continuem selecionáveis.
+
+    Parâmetros:
+    - rewritten_articles: Lista de dicionários de artigos reescritos (título, conteúdo, fonte)
+    - token_budget: Orçamento aproximado de tokens para todo o resumo
+
+    Retorna:
+    - Texto do resumo no mesmo formato INDEX/TITLE usado na entrada da reescrita
+    """
+    if token_budget is None:
+        token_budget = int(os.environ.get('COVER_DIGEST_TOKEN_BUDGET', DEFAULT_TOKEN_BUDGET))
+    if not rewritten_articles:
+        return ''
+
+    per_article_chars = token_budget * CHARS_PER_TOKEN // len(rewritten_articles)
+
+    entries = []
+    for index, article in enumerate(rewritten_articles):
+        title = article.get('title', '')
+        lead_chars = max(per_article_chars - len(title) - ENTRY_OVERHEAD, CHARS_PER_TOKEN * 20)
+        lead = lead_sentences(article.get('content', ''), lead_chars)
+        entries.append(f'INDEX:{index}\nTITLE:{title}\nLEAD:{lead}\n---ARTICLE DIVIDER---\n')
+    digest = ''.join(entries)
+
+    if running_locally:
+        print(f"Cover digest built: ~{estimate_tokens(digest)} tokens for {len(rewritten_articles)} articles.")
+    return digest
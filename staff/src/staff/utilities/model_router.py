@@ -0,0 +1,250 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+import yaml
+from globals import running_locally
+
+# Default path of the routing configuration
+# Caminho padrão da configuração de roteamento
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'models.yaml')
+
+# Samples older than this are forgotten, which also lets a demoted model be retried (seconds)
+# Amostras mais antigas que isso são esquecidas, o que também permite retestar um modelo rebaixado (segundos)
+WINDOW_SECONDS = 600
+
+# Maximum samples kept per stage and model
+# Máximo de amostras mantidas por etapa e modelo
+MAX_SAMPLES = 200
+
+# Minimum samples before a model's health is judged
+# Mínimo de amostras antes de avaliar a saúde de um modelo
+MIN_SAMPLES = 5
+
+# Error rate above which a model is considered unhealthy
+# Taxa de erros acima da qual um modelo é considerado não saudável
+ERROR_RATE_THRESHOLD = 0.3
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers, or None when empty.
+    Percentil por posição mais próxima de uma lista de números, ou None quando vazia.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class ModelRouter:
+    """
+    Tiered model routing with latency-SLO fallback.
+    Picks a model per stage from the candidates configured for the coin tier (or the
+    fast tier for short inputs), tracks rolling latency and errors per stage and model,
+    and falls back to the next candidate when the p95 exceeds the stage SLO or errors spike.
+    A failed call is retried once on the next healthy candidate.
+
+    Roteamento de modelos por faixa com fallback por SLO de latência.
+    Escolhe um modelo por etapa entre os candidatos configurados para a faixa de moedas
+    (ou a faixa rápida para entradas curtas), acompanha latência e erros recentes por
+    etapa e modelo, e usa o próximo candidato quando o p95 excede o SLO ou os erros disparam.
+    Uma chamada com falha é repetida uma vez no próximo candidato saudável.
+    """
+    def __init__(self, config_path=None):
+        with open(config_path or os.environ.get('MODEL_ROUTING_CONFIG', DEFAULT_CONFIG_PATH), encoding='utf-8') as config_file:
+            self.config = yaml.safe_load(config_file)
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._decisions = {}
+
+    def choose(self, stage, coins, input_chars=0) -> dict:
+        """
+        Pick the model for a stage and return the routing decision.
+        Escolhe o modelo para uma etapa e retorna a decisão de roteamento.
+        """
+        stage_config = self.config[stage]
+        tier, candidates = self._candidates(stage, coins, input_chars)
+
+        with self._lock:
+            health = [(model, self._health(stage, model, stage_config['slo_seconds'])) for model in candidates]
+
+            reason = 'primary'
+            model = candidates[0]
+            if health[0][1] is not None:
+                healthy = [candidate for candidate, problem in health if problem is None]
+                if healthy:
+                    model = healthy[0]
+                else:
+                    # Every candidate is degraded: use the one with the fewest recent errors, then lowest p95
+                    # Todos os candidatos estão degradados: usa o com menos erros recentes e depois menor p95
+                    model = min(candidates, key=lambda candidate: self._rank(stage, candidate))
+                reason = health[0][1]
+
+            counts = self._decisions.setdefault(stage, {})
+            counts[model] = counts.get(model, 0) + 1
+
+        decision = {
+            'stage': stage,
+            'model': model,
+            'tier': tier,
+            'reason': reason,
+        }
+        if model != candidates[0]:
+            decision['fallback_from'] = candidates[0]
+        if running_locally:
+            print(f"Model routing: {decision}")
+        return decision
+
+    def primary(self, stage, coins, input_chars=0) -> str:
+        """
+        Preferred model for a stage call, regardless of health.
+        Modelo preferido para a chamada de uma etapa, independentemente da saúde.
+        """
+        return self._candidates(stage, coins, input_chars)[1][0]
+
+    def record(self, stage, model, latency, ok):
+        """
+        Record the outcome of a model call.
+        Registra o resultado de uma chamada de modelo.
+        """
+        with self._lock:
+            self._samples.setdefault((stage, model), deque(maxlen=MAX_SAMPLES)).append((time.monotonic(), latency, ok))
+
+    def run(self, stage, coins, call, input_chars=0):
+        """
+        Route a stage call: choose a model, call `call(model)`, record latency and outcome.
+        When the call fails it is retried once on the next healthy candidate, with
+        reason 'error' and the failed model in `fallback_from`.
+        Returns the call result and the routing decision.
+
+        Roteia a chamada de uma etapa: escolhe um modelo, chama `call(model)`, registra
+        latência e resultado. Quando a chamada falha, ela é repetida uma vez no próximo
+        candidato saudável, com motivo 'error' e o modelo com falha em `fallback_from`.
+        Retorna o resultado da chamada e a decisão de roteamento.
+        """
+        decision = self.choose(stage, coins, input_chars)
+        try:
+            result, latency = self._timed(stage, decision['model'], call)
+        except Exception as e:
+            fallback = self._retry_candidate(stage, coins, input_chars, decision['model'])
+            if fallback is None:
+                raise
+            if running_locally:
+                print(f"Model routing: {decision['model']} failed ({e}), retrying with {fallback}")
+            decision = dict(decision, model=fallback, reason='error', fallback_from=decision['model'])
+            result, latency = self._timed(stage, fallback, call)
+        decision['latency_seconds'] = round(latency, 3)
+        return result, decision
+
+    def snapshot(self) -> dict:
+        """
+        Return rolling latency, error rate and decision counts per stage and model.
+        Retorna latência recente, taxa de erros e contagem de decisões por etapa e modelo.
+        """
+        with self._lock:
+            models = {}
+            for (stage, model), samples in self._samples.items():
+                self._prune(samples)
+                latencies = [latency for _, latency, ok in samples if ok]
+                p95 = percentile(latencies, 0.95)
+                models.setdefault(stage, {})[model] = {
+                    'samples': len(samples),
+                    'p95_seconds': round(p95, 3) if p95 is not None else None,
+                    'error_rate': round(self._error_rate(samples), 3),
+                }
+            return {
+                'models': models,
+                'decisions': {stage: dict(counts) for stage, counts in self._decisions.items()},
+            }
+
+    def _candidates(self, stage, coins, input_chars):
+        """
+        Tier and candidate models for a stage call.
+        Faixa e modelos candidatos para a chamada de uma etapa.
+        """
+        stage_config = self.config[stage]
+        tiers = stage_config['tiers']
+        tier = str(coins) if str(coins) in tiers else next(iter(tiers))
+        if input_chars and input_chars < stage_config.get('short_input_chars', 0):
+            tier = '1' if '1' in tiers else tier
+        return tier, tiers[tier]
+
+    def _retry_candidate(self, stage, coins, input_chars, failed):
+        """
+        Next candidate after a failed call: the first healthy other model, else the first other, else None.
+        Próximo candidato após uma falha: o primeiro outro modelo saudável, senão o primeiro outro, senão None.
+        """
+        _, candidates = self._candidates(stage, coins, input_chars)
+        others = [model for model in candidates if model != failed]
+        if not others:
+            return None
+        with self._lock:
+            slo_seconds = self.config[stage]['slo_seconds']
+            model = next((model for model in others if self._health(stage, model, slo_seconds) is None), others[0])
+            counts = self._decisions.setdefault(stage, {})
+            counts[model] = counts.get(model, 0) + 1
+        return model
+
+    def _timed(self, stage, model, call):
+        """
+        Call `call(model)` and record its latency and outcome. Returns the result and latency.
+        Chama `call(model)` e registra sua latência e resultado. Retorna o resultado e a latência.
+        """
+        started = time.monotonic()
+        try:
+            result = call(model)
+        except Exception:
+            self.record(stage, model, time.monotonic() - started, False)
+            raise
+        latency = time.monotonic() - started
+        self.record(stage, model, latency, True)
+        return result, latency
+
+    def _health(self, stage, model, slo_seconds):
+        """
+        Return None when the model is healthy for the stage, otherwise the reason. Must hold the lock.
+        Retorna None quando o modelo está saudável para a etapa, senão o motivo. Deve ser chamado com o lock.
+        """
+        samples = self._samples.get((stage, model))
+        if not samples:
+            return None
+        self._prune(samples)
+        if len(samples) < MIN_SAMPLES:
+            return None
+        if self._error_rate(samples) > ERROR_RATE_THRESHOLD:
+            return 'error_rate'
+        p95 = percentile([latency for _, latency, ok in samples if ok], 0.95)
+        if p95 is not None and p95 > slo_seconds:
+            return 'p95_over_slo'
+        return None
+
+    def _rank(self, stage, model):
+        """
+        Sort key among degraded candidates: error rate, then p95 latency. Must hold the lock.
+        Chave de ordenação entre candidatos degradados: taxa de erros e depois p95. Deve ser chamado com o lock.
+        """
+        samples = self._samples.get((stage, model), ())
+        p95 = percentile([latency for _, latency, ok in samples if ok], 0.95)
+        return self._error_rate(samples), p95 if p95 is not None else 0.0
+
+    @staticmethod
+    def _error_rate(samples):
+        """
+        Fraction of failed calls among the samples.
+        Fração de chamadas com falha entre as amostras.
+        """
+        if not samples:
+            return 0.0
+        return sum(1 for _, _, ok in samples if not ok) / len(samples)
+
+    @staticmethod
+    def _prune(samples):
+        """
+        Drop samples older than the rolling window.
+        Remove amostras mais antigas que a janela recente.
+        """
+        cutoff = time.monotonic() - WINDOW_SECONDS
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
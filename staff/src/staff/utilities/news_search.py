@@ -0,0 +1,119 @@
+import math
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+# Date sub-windows per search period (days)
+# Subjanelas de data por período de busca (dias)
+WINDOWS_PER_PERIOD = {
+    1: 1,
+    7: 2,
+    30: 3,
+}
+
+# Query variants run concurrently for each date sub-window
+# Variações de consulta executadas em paralelo para cada subjanela de data
+# Query parameters that only track the visit and never identify the article
+# Parâmetros de query que apenas rastreiam a visita e nunca identificam o artigo
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'ref', 'ref_src', 'cmpid', 'ncid', 'ocid', 'smid'}
+
+QUERY_TEMPLATES = [
+    "The most relevant news about {topic}:",
+    "Latest developments in {topic}:",
+    "In-depth reporting on {topic}:",
+]
+
+
+def canonical_url(url) -> str:
+    """
+    Canonical form of a URL: no scheme, www, fragment, trailing slash or tracking
+    parameters; the remaining query parameters are kept, sorted, since they can identify the article.
+    Forma canônica de uma URL: sem esquema, www, fragmento, barra final ou parâmetros de
+    rastreamento; os demais parâmetros de query são mantidos, ordenados, pois podem identificar o artigo.
+    """
+    parsed = urlparse((url or '').strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+    return host + parsed.path.rstrip('/') + ('?' + urlencode(query) if query else '')
+
+
+def source_domain(url) -> str:
+    """
+    Site name of a URL, as shown in the article source.
+    Nome do site de uma URL, como exibido na fonte do artigo.
+    """
+    return urlparse(url).netloc.replace('www.', '')
+
+
+def query_variants(topic) -> list:
+    """
+    Search queries for a topic.
+    Consultas de busca para um tópico.
+    """
+    return [template.format(topic=topic) for template in QUERY_TEMPLATES]
+
+
+def date_windows(period, now=None) -> list:
+    """
+    Split the last `period` days into consecutive (start, end) windows, newest first.
+    Divide os últimos `period` dias em janelas (início, fim) consecutivas, mais recentes primeiro.
+    """
+    now = now or datetime.now()
+    count = WINDOWS_PER_PERIOD.get(period, max(1, math.ceil(period / 10)))
+    step = timedelta(days=period) / count
+    return [(now - step * (index + 1), now - step * index) for index in range(count)]
+
+
+def rank_results(result_lists, n_news, max_per_domain=None) -> list:
+    """
+    Every unique result of the ranked search lists, in selection order.
+    Lists are interleaved rank by rank so each query and window contributes its best
+    hits first; duplicates by canonical URL or title are dropped, and each domain is
+    capped within the first n_news to keep the selection diverse. The remaining results
+    follow in order and serve as replacements when a selected one cannot be downloaded.
+
+    Todos os resultados únicos das listas ranqueadas de busca, em ordem de seleção.
+    As listas são intercaladas posição a posição para que cada consulta e janela contribua
+    primeiro com seus melhores resultados; duplicados por URL canônica ou título são
+    descartados, e cada domínio é limitado entre os primeiros n_news para manter a seleção
+    diversa. Os demais resultados vêm em seguida e servem de substitutos quando um
+    selecionado não pode ser baixado.
+    """
+    if max_per_domain is None:
+        max_per_domain = max(1, math.ceil(n_news / 4))
+
+    interleaved = []
+    for rank in range(max((len(results) for results in result_lists), default=0)):
+        for results in result_lists:
+            if rank < len(results):
+                interleaved.append(results[rank])
+
+    unique = []
+    seen_urls = set()
+    seen_titles = set()
+    for result in interleaved:
+        url = canonical_url(result.url)
+        title = ' '.join((result.title or '').split()).lower()
+        if url in seen_urls or (title and title in seen_titles):
+            continue
+        seen_urls.add(url)
+        if title:
+            seen_titles.add(title)
+        unique.append(result)
+
+    selected = []
+    per_domain = {}
+    for result in unique:
+        domain = source_domain(result.url)
+        if per_domain.get(domain, 0) < max_per_domain:
+            selected.append(result)
+            per_domain[domain] = per_domain.get(domain, 0) + 1
+        if len(selected) == n_news:
+            break
+
+    chosen = {id(result) for result in selected}
+    return selected + [result for result in unique if id(result) not in chosen]
@@ -0,0 +1,265 @@
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from globals import running_locally
+
+# How long prewarmed results stay fresh per coins tier (seconds)
+# Por quanto tempo os resultados pré-aquecidos permanecem válidos por faixa de moedas (segundos)
+FRESHNESS_SECONDS = {
+    '1': 60 * 60,
+    '3': 6 * 60 * 60,
+    '7': 24 * 60 * 60,
+}
+
+# Fraction of the freshness window after which a hot key is warmed again
+# Fração da janela de validade após a qual uma chave popular é aquecida novamente
+REWARM_FRACTION = 0.75
+
+# Estimated spend per stage call, in the same unit as the hourly budget (USD)
+# Gasto estimado por chamada de etapa, na mesma unidade do orçamento por hora (USD)
+STAGE_COSTS = {
+    'translate': 0.0005,
+    'fetch': 0.01,
+    'rewrite': 0.05,
+    'cover': 0.01,
+    'image': 0.04,
+}
+
+# Maximum number of entries kept in the store
+# Número máximo de entradas mantidas no armazenamento
+MAX_ENTRIES = 512
+
+
+def freshness_seconds(coins) -> int:
+    """
+    Freshness window for a coins tier.
+    Janela de validade para uma faixa de moedas.
+    """
+    return FRESHNESS_SECONDS.get(str(coins), min(FRESHNESS_SECONDS.values()))
+
+
+def normalize_topic(topic) -> str:
+    """
+    Normalize a raw topic so equivalent requests share keys.
+    Normaliza um tópico bruto para que requisições equivalentes compartilhem chaves.
+    """
+    return ' '.join(topic.split()).lower()
+
+
+# Store keys for each stage result
+# Chaves do armazenamento para o resultado de cada etapa
+def translation_key(topic):
+    return ('translate', normalize_topic(topic))
+
+
+def articles_key(topic, n_news, period):
+    return ('articles', topic, int(n_news), int(period))
+
+
+def image_key(topic, coins):
+    return ('image', topic, str(coins))
+
+
+class PrewarmStore:
+    """
+    Bounded in-memory store of stage results with a freshness deadline per entry.
+    Armazenamento em memória limitado de resultados de etapas com prazo de validade por entrada.
+    """
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, max_age=None):
+        """
+        Return the fresh value for a key, or None. With max_age, values stored longer ago also count as missing.
+        Retorna o valor válido de uma chave, ou None. Com max_age, valores armazenados há mais tempo também contam como ausentes.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.time()
+            if entry is None or entry[0] < now:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            if max_age is not None and now - entry[1] > max_age:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value, ttl):
+        """
+        Store a value for ttl seconds, evicting the least recently used entries when full.
+        Armazena um valor por ttl segundos, removendo as entradas menos usadas quando cheio.
+        """
+        with self._lock:
+            now = time.time()
+            self._entries[key] = (now + ttl, now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        """
+        Return entry and hit counters.
+        Retorna contadores de entradas e acertos.
+        """
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class RequestHistory:
+    """
+    Recent (topic, language, coins) requests, used to find hot magazine keys.
+    Requisições recentes de (tópico, idioma, moedas), usadas para encontrar chaves populares.
+    """
+    def __init__(self, window_seconds=6 * 60 * 60, max_requests=5000):
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._requests = deque(maxlen=max_requests)
+
+    def record(self, topic, language, coins):
+        """
+        Record a magazine request.
+        Registra uma requisição de revista.
+        """
+        with self._lock:
+            self._requests.append((time.time(), (normalize_topic(topic), language, str(coins))))
+
+    def hot_keys(self, min_hits, limit):
+        """
+        Most requested keys within the window that reached min_hits.
+        Chaves mais requisitadas dentro da janela que atingiram min_hits.
+        """
+        cutoff = time.time() - self.window_seconds
+        with self._lock:
+            while self._requests and self._requests[0][0] < cutoff:
+                self._requests.popleft()
+            counts = Counter(key for _, key in self._requests)
+        return [key for key, hits in counts.most_common(limit) if hits >= min_hits]
+
+
+class Prewarmer:
+    """
+    Background scheduler that precomputes magazines for hot (topic, language, coins) keys.
+    Runs only while the admission controller reports no live work, and stops spending
+    once the hourly budget is used. The actual stage calls are done by `warm`, which
+    receives `proceed(stage)` and must call it before every stage. Yielding to live
+    traffic happens between stages only; a stage already running keeps going, holding
+    one reserved admission slot so live requests are admitted against the remaining capacity.
+
+    Agendador em segundo plano que pré-calcula revistas para chaves populares de
+    (tópico, idioma, moedas). Executa apenas enquanto o controle de admissão não indica
+    trabalho ao vivo e para de gastar quando o orçamento por hora é atingido. As chamadas
+    das etapas são feitas por `warm`, que recebe `proceed(stage)` e deve chamá-lo antes de cada etapa.
+    A vez é cedida ao tráfego ao vivo apenas entre etapas; uma etapa já em execução continua,
+    ocupando uma vaga reservada do controle de admissão para que as requisições ao vivo sejam
+    admitidas com a capacidade restante.
+    """
+    def __init__(self, history, admission, warm):
+        self.history = history
+        self.admission = admission
+        self.warm = warm
+        self.budget_per_hour = float(os.environ.get('PREWARM_BUDGET_PER_HOUR', 1.0))
+        self.interval = float(os.environ.get('PREWARM_INTERVAL_SECONDS', 60))
+        self.min_hits = int(os.environ.get('PREWARM_MIN_HITS', 3))
+        self.max_keys = int(os.environ.get('PREWARM_MAX_KEYS', 10))
+        self._lock = threading.Lock()
+        self._spend = deque()
+        self._last_warmed = {}
+        self.warmed = 0
+        self.yielded = 0
+        self.failed = 0
+
+    def start(self):
+        """
+        Start the scheduler in a daemon thread.
+        Inicia o agendador em uma thread daemon.
+        """
+        thread = threading.Thread(target=self._loop, name='prewarmer', daemon=True)
+        thread.start()
+        return thread
+
+    def run_once(self):
+        """
+        Warm every hot key whose last warm-up is older than its rewarm point.
+        Aquece cada chave popular cujo último aquecimento é mais antigo que seu ponto de reaquecimento.
+        """
+        for key in self.history.hot_keys(self.min_hits, self.max_keys):
+            topic, language, coins = key
+            last = self._last_warmed.get(key, 0)
+            if time.time() - last < freshness_seconds(coins) * REWARM_FRACTION:
+                continue
+            if not self.admission.reserve_background():
+                self.yielded += 1
+                return
+            try:
+                if self.warm(topic, language, coins, self._proceed):
+                    self._last_warmed[key] = time.time()
+                    self.warmed += 1
+                    if running_locally:
+                        print(f"Prewarmed magazine: {key}")
+            except Exception as e:
+                self.failed += 1
+                if running_locally:
+                    print(f"Prewarm error for {key}: {e}")
+            finally:
+                self.admission.release_background()
+
+    def snapshot(self) -> dict:
+        """
+        Return spend and warm-up counters.
+        Retorna contadores de gasto e aquecimento.
+        """
+        with self._lock:
+            return {
+                'spent_last_hour': round(self._spent_last_hour(), 4),
+                'budget_per_hour': self.budget_per_hour,
+                'warmed': self.warmed,
+                'yielded': self.yielded,
+                'failed': self.failed,
+                'warm_keys': len(self._last_warmed),
+            }
+
+    def _loop(self):
+        """
+        Scheduler loop.
+        Loop do agendador.
+        """
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                if running_locally:
+                    print(f"Prewarm scheduler error: {e}")
+
+    def _proceed(self, stage):
+        """
+        Whether a stage may run now: no live work and enough budget left. Charges its cost.
+        Se uma etapa pode executar agora: sem trabalho ao vivo e com orçamento restante. Cobra seu custo.
+        """
+        if not self.admission.idle():
+            self.yielded += 1
+            return False
+        cost = STAGE_COSTS.get(stage, 0.0)
+        with self._lock:
+            if self._spent_last_hour() + cost > self.budget_per_hour:
+                return False
+            self._spend.append((time.time(), cost))
+        return True
+
+    def _spent_last_hour(self):
+        """
+        Spend within the last hour. Must hold the lock.
+        Gasto na última hora. Deve ser chamado com o lock.
+        """
+        cutoff = time.time() - 60 * 60
+        while self._spend and self._spend[0][0] < cutoff:
+            self._spend.popleft()
+        return sum(cost for _, cost in self._spend)
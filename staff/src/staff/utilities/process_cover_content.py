@@ -1,75 +1,109 @@
 from typing import Dict, Any
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
 from globals import running_locally
+from utilities.structured_output import StructuredOutputParser
 
-def process_cover_content(result: str) -> Dict[str, Any]:
+class CoverContent(BaseModel):
+    """
+    Schema of the magazine cover content.
+    Esquema do conteúdo da capa da revista.
+    """
+    main_headline: str = Field(min_length=1)
+    subheading: str = Field(min_length=1)
+    main_article_index: int = Field(ge=0)
+    summary1_index: int = Field(ge=0)
+    summary1: str = Field(min_length=1)
+    summary2_index: int = Field(ge=0)
+    summary2: str = Field(min_length=1)
+
+    @field_validator('main_article_index', 'summary1_index', 'summary2_index')
+    @classmethod
+    def index_in_range(cls, value: int, info: ValidationInfo) -> int:
+        """
+        Reject indices past the number of articles, when known.
+        Rejeita índices além do número de artigos, quando conhecido.
+        """
+        n_articles = (info.context or {}).get('n_articles')
+        if n_articles is not None and value >= n_articles:
+            raise ValueError(f'index must be lower than {n_articles}')
+        return value
+
+# Parser for the cover task output format defined in config/tasks.yaml
+# Parser para o formato de saída da tarefa de capa definido em config/tasks.yaml
+cover_parser = StructuredOutputParser(
+    CoverContent,
+    labels={
+        'MAIN_HEADLINE': 'main_headline',
+        'SUBHEADING': 'subheading',
+        'MAIN_ARTICLE_INDEX': 'main_article_index',
+        'SUMMARY1_INDEX': 'summary1_index',
+        'SUMMARY1': 'summary1',
+        'SUMMARY2_INDEX': 'summary2_index',
+        'SUMMARY2': 'summary2',
+    },
+    hints={
+        'MAIN_HEADLINE': 'A single impactful word',
+        'SUBHEADING': 'A catchy phrase based on the main article',
+        'MAIN_ARTICLE_INDEX': 'Index of the main article (0-based) NUMBER ONLY',
+        'SUMMARY1_INDEX': 'Index of first summary article (0-based) NUMBER ONLY',
+        'SUMMARY1': 'One-sentence summary of the first summary article',
+        'SUMMARY2_INDEX': 'Index of second summary article (0-based) NUMBER ONLY',
+        'SUMMARY2': 'One-sentence summary of the second summary article',
+    },
+)
+
+def process_cover_content(result: str, n_articles: int = None, complete=None, articles: str = '') -> Dict[str, Any]:
     """
     Process the raw output from the cover content creation task.
     Converts the text format into a structured dictionary with magazine cover elements.
-    
+    Missing or invalid fields are re-asked individually when `complete` is given;
+    fields that remain invalid are left out.
+
     Parameters:
     - result: Raw string output from the AI cover content generation task
-    
+    - n_articles: Number of available articles, used to validate the indices
+    - complete: Optional function that sends a prompt to a model and returns its text answer
+    - articles: Article list given to the cover designer, included in re-ask prompts
+
     Returns:
     - Dictionary containing structured cover content (headlines, summaries, and article indices)
-    
+
     Processa a saída bruta da tarefa de criação de conteúdo da capa.
     Converte o formato de texto em um dicionário estruturado com elementos da capa da revista.
-    
+    Campos ausentes ou inválidos recebem uma nova pergunta individual quando `complete`
+    é informado; campos que continuarem inválidos são omitidos.
+
     Parâmetros:
     - result: String bruta de saída da tarefa de geração de conteúdo de capa pela IA
-    
+    - n_articles: Número de artigos disponíveis, usado para validar os índices
+    - complete: Função opcional que envia um prompt a um modelo e retorna a resposta em texto
+    - articles: Lista de artigos dada ao designer de capa, incluída nas novas perguntas
+
     Retorna:
     - Dicionário contendo conteúdo estruturado da capa (manchetes, resumos e índices de artigos)
     """
     if running_locally:
         print("Processing cover content...")  # Debug print
-        
-    # Split the result into lines for processing
-    # Divide o resultado em linhas para processamento
-    lines = result.strip().split('\n')
-    cover_content = {}
-    
-    # Extract each cover element from the formatted text
-    # Extrai cada elemento da capa do texto formatado
-    for line in lines:
-        if line.startswith('MAIN_HEADLINE:'):
-            # Extract the main headline/title for the magazine cover
-            # Extrai a manchete/título principal para a capa da revista
-            cover_content['main_headline'] = line.replace('MAIN_HEADLINE:', '').strip()
-            
-        elif line.startswith('SUBHEADING:'):
-            # Extract the subheading/subtitle for the magazine cover
-            # Extrai o subtítulo para a capa da revista
-            cover_content['subheading'] = line.replace('SUBHEADING:', '').strip()
-            
-        elif line.startswith('MAIN_ARTICLE_INDEX:'):
-            # Extract the index of the main featured article
-            # Extrai o índice do artigo principal em destaque
-            cover_content['main_article_index'] = int(line.replace('MAIN_ARTICLE_INDEX:', '').strip())
-            
-        elif line.startswith('SUMMARY1_INDEX:'):
-            # Extract the index of the first summary article
-            # Extrai o índice do primeiro artigo resumido
-            cover_content['summary1_index'] = int(line.replace('SUMMARY1_INDEX:', '').strip())
-            
-        elif line.startswith('SUMMARY1:'):
-            # Extract the text summary of the first highlighted article
-            # Extrai o resumo de texto do primeiro artigo destacado
-            cover_content['summary1'] = line.replace('SUMMARY1:', '').strip()
-            
-        elif line.startswith('SUMMARY2_INDEX:'):
-            # Extract the index of the second summary article
-            # Extrai o índice do segundo artigo resumido
-            cover_content['summary2_index'] = int(line.replace('SUMMARY2_INDEX:', '').strip())
-            
-        elif line.startswith('SUMMARY2:'):
-            # Extract the text summary of the second highlighted article
-            # Extrai o resumo de texto do segundo artigo destacado
-            cover_content['summary2'] = line.replace('SUMMARY2:', '').strip()
-    
+
+    # Parse and validate the cover elements in a single pass
+    # Interpreta e valida os elementos da capa em uma única passagem
+    context = {'n_articles': n_articles}
+    records = cover_parser.parse(result, context)
+    if not records:
+        return {}
+    record = next((record for record in records if record.value is not None), records[0])
+
+    # Re-ask only the missing or invalid fields
+    # Pergunta novamente apenas os campos ausentes ou inválidos
+    if record.value is None and complete is not None:
+        instructions = 'Keep the same language as the answer. The indices refer to these articles:\n' + articles
+        cover_parser.repair([record], complete, context, instructions=instructions)
+
+    cover_content = record.value if record.value is not None else cover_parser.partial(record)
+
     if running_locally:
         print("Cover content processed successfully.")  # Debug print
-        
+
     # Return the structured cover content dictionary
     # Retorna o dicionário estruturado de conteúdo da capa
-    return cover_content
\ No newline at end of file
+    return cover_content
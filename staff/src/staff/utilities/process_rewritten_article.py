@@ -1,90 +1,112 @@
+from pydantic import BaseModel, Field
 from globals import running_locally
+from utilities.structured_output import StructuredOutputParser
 
-def process_rewritten_article(result: str) -> list:
+class RewrittenArticle(BaseModel):
+    """
+    Schema of a rewritten article.
+    Esquema de um artigo reescrito.
+    """
+    title: str = Field(min_length=1)
+    content: str = Field(min_length=1)
+    source: str = Field(min_length=1)
+
+# Parser for the rewrite task output format defined in config/tasks.yaml
+# Parser para o formato de saída da tarefa de reescrita definido em config/tasks.yaml
+article_parser = StructuredOutputParser(
+    RewrittenArticle,
+    labels={
+        'NEW_TITLE': 'title',
+        'NEW_CONTENT': 'content',
+        'ORIGINAL_SOURCE': 'source',
+    },
+    hints={
+        'NEW_TITLE': 'A concise and engaging title for this article',
+        'ORIGINAL_SOURCE': 'The credit line with the original sources and titles used by this article, separated by ";"',
+    },
+    multiline=['content'],
+    divider='---ARTICLE DIVIDER---',
+    # Only fields derivable from the article itself and the source list; a re-ask for
+    # missing content would have no source text and invent an article
+    # Apenas campos deriváveis do próprio artigo e da lista de fontes; uma nova pergunta
+    # pelo conteúdo ausente não teria o texto original e inventaria um artigo
+    reaskable=['title', 'source'],
+)
+
+def process_rewritten_article(result: str, complete=None, sources: str = '') -> list:
     """
     Process the raw output from the article rewriting task.
     Converts the text format into a structured list of article dictionaries.
     Now handles multiple articles from a single combined response.
-    
+    Articles with a missing or invalid title or source are re-asked for just that field
+    when `complete` is given; articles without content or still invalid are dropped.
+
     Parameters:
     - result: Raw string output from the AI article rewriting task
-    
+    - complete: Optional function that sends a prompt to a model and returns its text answer
+    - sources: Original articles as "site - title" lines, included in re-ask prompts for the credit line
+
     Returns:
     - List of dictionaries, each containing a rewritten article with title, content, and source
-    
+
     Processa a saída bruta da tarefa de reescrita de artigos.
     Converte o formato de texto em uma lista estruturada de dicionários de artigos.
     Agora processa múltiplos artigos de uma única resposta combinada.
-    
+    Artigos com título ou fonte ausente ou inválido recebem uma nova pergunta apenas para
+    esse campo quando `complete` é informado; artigos sem conteúdo ou ainda inválidos são descartados.
+
     Parâmetros:
     - result: String bruta de saída da tarefa de reescrita de artigos pela IA
-    
+    - complete: Função opcional que envia um prompt a um modelo e retorna a resposta em texto
+    - sources: Artigos originais como linhas "site - título", incluídos nas novas perguntas para a linha de crédito
+
     Retorna:
     - Lista de dicionários, cada um contendo um artigo reescrito com título, conteúdo e fonte
     """
     if running_locally:
         print("Processing rewritten articles...")  # Debug print
-    
-    # Split the result by article divider to separate multiple articles
-    # Divide o resultado pelo separador de artigos para separar múltiplos artigos
-    articles_raw = result.strip().split('---ARTICLE DIVIDER---')
-    processed_articles = []
-    
-    # Process each article segment individually
-    # Processa cada segmento de artigo individualmente
-    for article_text in articles_raw:
-        if not article_text.strip():  # Skip empty entries / Pula entradas vazias
-            continue
-            
-        # Split article text into lines for processing
-        # Divide o texto do artigo em linhas para processamento
-        lines = article_text.strip().split('\n')
-        new_title = ''
-        new_content = ''
-        original_source = ''
-        
-        # Track which section of the article we're currently processing
-        # Acompanha qual seção do artigo estamos processando atualmente
-        current_section = None
-        
-        # Extract article components from the formatted text
-        # Extrai componentes do artigo do texto formatado
-        for line in lines:
-            if line.startswith('NEW_TITLE:'):
-                # Extract the rewritten article title
-                # Extrai o título reescrito do artigo
-                current_section = 'title'
-                new_title = line.replace('NEW_TITLE:', '').strip()
-                
-            elif line.startswith('NEW_CONTENT:'):
-                # Extract the beginning of the rewritten article content
-                # Extrai o início do conteúdo reescrito do artigo
-                current_section = 'content'
-                new_content = line.replace('NEW_CONTENT:', '').strip()
-                
-            elif line.startswith('ORIGINAL_SOURCE:'):
-                # Extract the original source attribution
-                # Extrai a atribuição da fonte original
-                current_section = 'source'
-                original_source = line.replace('ORIGINAL_SOURCE:', '').strip()
-                
-            elif current_section == 'content':
-                # Append additional content lines to the article body
-                # Adiciona linhas adicionais de conteúdo ao corpo do artigo
-                new_content += '\n' + line
-        
-        # Only add articles that have a valid title
-        # Adiciona apenas artigos que têm um título válido
-        if new_title:
-            processed_articles.append({
-                'title': new_title,
-                'content': new_content,
-                'source': original_source
-            })
-            
+
+    # Parse and validate every article in a single pass
+    # Interpreta e valida todos os artigos em uma única passagem
+    records = article_parser.parse(result)
+
+    # Re-ask only the missing or invalid fields of invalid articles
+    # Pergunta novamente apenas os campos ausentes ou inválidos dos artigos inválidos
+    if complete is not None and any(record.value is None for record in records):
+        instructions = 'Keep the same language as the answer. The original articles were:\n' + sources
+        article_parser.repair(records, complete, instructions=instructions)
+
+    processed_articles = [record.value for record in records if record.value is not None]
+
     if running_locally:
-        print(f"Processed {len(processed_articles)} rewritten articles successfully.")  # Debug print
-        
+        dropped = len(records) - len(processed_articles)
+        print(f"Processed {len(processed_articles)} rewritten articles successfully ({dropped} dropped).")  # Debug print
+
     # Return the list of processed articles
     # Retorna a lista de artigos processados
-    return processed_articles
\ No newline at end of file
+    return processed_articles
+
+def credited_articles(rewritten_article: dict, articles: list):
+    """
+    Indices of the fetched articles credited in a rewritten article's source line,
+    or None when an entry cannot be matched. An entry matches by site and title, or by
+    site alone, taking every article from that site, when no title matches.
+
+    Índices dos artigos buscados creditados na linha de fonte de um artigo reescrito,
+    ou None quando uma entrada não corresponde a nenhum. Uma entrada corresponde por site
+    e título, ou apenas pelo site, tomando todos os artigos desse site, se nenhum título corresponder.
+    """
+    def normalize(text):
+        return ' '.join((text or '').split()).lower()
+
+    indices = set()
+    for entry in (rewritten_article.get('source') or '').split(';'):
+        if not entry.strip():
+            continue
+        site, _, title = entry.partition(' - ')
+        same_site = [index for index, article in enumerate(articles) if normalize(article.get('source')) == normalize(site)]
+        same_title = [index for index in same_site if normalize(articles[index].get('title')) == normalize(title)]
+        if not same_site:
+            return None
+        indices.update(same_title or same_site)
+    return sorted(indices) or None
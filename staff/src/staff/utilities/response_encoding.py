@@ -0,0 +1,280 @@
+import gzip
+import json
+import os
+import threading
+from io import BytesIO
+from flask import Response, request
+from globals import running_locally
+
+# Optional fast serializer and compressors, used when installed
+# Serializador rápido e compressores opcionais, usados quando instalados
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Responses smaller than this are sent uncompressed (bytes)
+# Respostas menores que isso são enviadas sem compressão (bytes)
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+
+# Compression levels tuned for speed, since payloads are generated per request
+# Níveis de compressão ajustados para velocidade, pois os payloads são gerados por requisição
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+
+class RequestBodyError(ValueError):
+    """
+    Request body that cannot be decoded, with the HTTP status to answer with.
+    Corpo de requisição que não pode ser decodificado, com o status HTTP da resposta.
+    """
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def dumps(payload) -> bytes:
+    """
+    Serialize a payload to UTF-8 JSON bytes, using orjson when available.
+    Serializa um payload para bytes JSON em UTF-8, usando orjson quando disponível.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: bytes):
+    """
+    Parse UTF-8 JSON bytes, using orjson when available.
+    Interpreta bytes JSON em UTF-8, usando orjson quando disponível.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def available_encodings() -> list:
+    """
+    Content encodings supported in this environment, in order of preference.
+    Codificações de conteúdo suportadas neste ambiente, em ordem de preferência.
+    """
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.append('gzip')
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str):
+    """
+    Pick the preferred supported encoding from an Accept-Encoding header, or None.
+    Escolhe a codificação suportada preferida de um header Accept-Encoding, ou None.
+    """
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        if not part.strip():
+            continue
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    candidates = [
+        encoding for encoding in available_encodings()
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0
+    ]
+    if not candidates:
+        return None
+    # Highest quality wins; ties keep our own preference order
+    # A maior qualidade vence; empates mantêm nossa ordem de preferência
+    return max(candidates, key=lambda encoding: accepted.get(encoding, accepted.get('*', 0.0)))
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """
+    Compress bytes with the given content encoding.
+    Comprime bytes com a codificação de conteúdo informada.
+    """
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: str, max_size: int) -> bytes:
+    """
+    Decompress a request body, refusing to expand beyond max_size bytes.
+    Every decoder stops producing output past max_size + 1 bytes, so a small
+    compressed body cannot expand to an arbitrary size in memory.
+
+    Descomprime o corpo de uma requisição, recusando expandir além de max_size bytes.
+    Cada decodificador para de produzir saída após max_size + 1 bytes, então um corpo
+    comprimido pequeno não pode se expandir para um tamanho arbitrário em memória.
+    """
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+        return data
+    try:
+        if encoding in ('gzip', 'x-gzip'):
+            result = gzip.GzipFile(fileobj=BytesIO(data)).read(max_size + 1)
+        elif encoding == 'br' and brotli is not None:
+            decompressor = brotli.Decompressor()
+            result = decompressor.process(data, output_buffer_limit=max_size + 1)
+            if len(result) <= max_size and not decompressor.is_finished():
+                raise RequestBodyError("Truncated br request body")
+        elif encoding == 'zstd' and zstandard is not None:
+            result = zstandard.ZstdDecompressor().stream_reader(BytesIO(data)).read(max_size + 1)
+        else:
+            raise RequestBodyError(f"Unsupported request Content-Encoding: {encoding}", 415)
+    except RequestBodyError:
+        raise
+    except Exception as e:
+        raise RequestBodyError(f"Invalid {encoding} request body: {e}")
+
+    if len(result) > max_size:
+        raise RequestBodyError("Decompressed request body is too large", 413)
+    return result
+
+
+class ResponseEncoder:
+    """
+    Encoding layer for the magazine endpoints.
+    Serializes responses with a fast JSON serializer, compresses them according to
+    Accept-Encoding above a size threshold, trims process data to the requested
+    fields or to the keys a step added (delta mode), accepts compressed request
+    bodies and keeps per-endpoint byte counters.
+
+    Camada de codificação para os endpoints da revista.
+    Serializa respostas com um serializador JSON rápido, comprime conforme o
+    Accept-Encoding acima de um tamanho mínimo, reduz os dados do processo aos campos
+    solicitados ou às chaves adicionadas pela etapa (modo delta), aceita corpos de
+    requisição comprimidos e mantém contadores de bytes por endpoint.
+    """
+    def __init__(self, threshold=None, max_request_size=16 * 1024 * 1024):
+        if threshold is None:
+            threshold = int(os.environ.get('COMPRESSION_THRESHOLD', DEFAULT_COMPRESSION_THRESHOLD))
+        self.threshold = threshold
+        self.max_request_size = max_request_size
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def read_json(self) -> dict:
+        """
+        Read the JSON body of the current request, decompressing it if needed.
+        Raises RequestBodyError when the body cannot be decoded.
+
+        Lê o corpo JSON da requisição atual, descomprimindo se necessário.
+        Lança RequestBodyError quando o corpo não pode ser decodificado.
+        """
+        wire = request.get_data(cache=False)
+        body = decompress(wire, request.headers.get('Content-Encoding'), self.max_request_size)
+        self._record(request_wire=len(wire), request_raw=len(body))
+        try:
+            payload = loads(body) if body else {}
+        except ValueError as e:
+            raise RequestBodyError(f"Invalid JSON request body: {e}")
+        if not isinstance(payload, dict):
+            raise RequestBodyError("Request body must be a JSON object")
+        return payload
+
+    def respond(self, payload: dict, status: int = 200, added=None) -> Response:
+        """
+        Build the response for a step payload.
+        Query parameter `fields` (comma separated) keeps only those process data keys;
+        `delta=1` keeps only the keys listed in `added`, i.e. what this step produced.
+
+        Monta a resposta para o payload de uma etapa.
+        O parâmetro `fields` (separado por vírgulas) mantém apenas essas chaves dos dados
+        do processo; `delta=1` mantém apenas as chaves em `added`, ou seja, o que a etapa gerou.
+        """
+        payload = self._select_fields(payload, added)
+        body = dumps(payload)
+        raw_size = len(body)
+
+        headers = {'Vary': 'Accept-Encoding'}
+        if raw_size >= self.threshold:
+            encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+            if encoding is not None:
+                body = compress(body, encoding)
+                headers['Content-Encoding'] = encoding
+
+        self._record(response_raw=raw_size, response_wire=len(body))
+        if running_locally:
+            print(f"Response for {request.endpoint}: {raw_size} bytes raw, {len(body)} bytes sent.")
+        return Response(body, status=status, headers=headers, mimetype='application/json')
+
+    def snapshot(self) -> dict:
+        """
+        Return per-endpoint byte counters, including bytes saved by compression.
+        Retorna contadores de bytes por endpoint, incluindo bytes economizados pela compressão.
+        """
+        with self._lock:
+            return {
+                endpoint: dict(
+                    stats,
+                    bytes_saved=(stats['response_raw'] - stats['response_wire'])
+                                + (stats['request_raw'] - stats['request_wire'])
+                )
+                for endpoint, stats in self._stats.items()
+            }
+
+    @staticmethod
+    def _select_fields(payload, added):
+        """
+        Apply the `fields` and `delta` query parameters to the process data.
+        Aplica os parâmetros `fields` e `delta` aos dados do processo.
+        """
+        process_data = payload.get('process_data')
+        if process_data is None:
+            return payload
+
+        fields = request.args.get('fields')
+        if fields:
+            keep = {field.strip() for field in fields.split(',')}
+        elif request.args.get('delta') in ('1', 'true') and added is not None:
+            keep = set(added)
+        else:
+            return payload
+
+        keep.add('status')
+        return dict(payload, process_data={key: value for key, value in process_data.items() if key in keep})
+
+    def _record(self, **sizes):
+        """
+        Add byte counts to the stats of the current endpoint.
+        Soma contagens de bytes às estatísticas do endpoint atual.
+        """
+        with self._lock:
+            stats = self._stats.setdefault(request.endpoint, {
+                'requests': 0,
+                'request_wire': 0,
+                'request_raw': 0,
+                'responses': 0,
+                'response_raw': 0,
+                'response_wire': 0,
+            })
+            if 'response_raw' in sizes:
+                stats['responses'] += 1
+            else:
+                stats['requests'] += 1
+            for key, size in sizes.items():
+                stats[key] += size
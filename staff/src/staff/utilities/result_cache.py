@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from globals import running_locally
+from utilities.news_search import canonical_url
+
+# Files whose content defines the prompts; editing them invalidates cached results
+# Arquivos cujo conteúdo define os prompts; editá-los invalida os resultados em cache
+PROMPT_FILES = [
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'agents.yaml'),
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'config', 'tasks.yaml'),
+]
+
+# Default location and size bound of the on-disk cache
+# Local padrão e limite de tamanho do cache em disco
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'editto_cache')
+DEFAULT_MAX_MB = 128
+
+
+def prompt_version() -> str:
+    """
+    Hash of the agent and task YAML files.
+    Hash dos arquivos YAML de agentes e tarefas.
+    """
+    digest = hashlib.sha256()
+    for path in PROMPT_FILES:
+        with open(path, 'rb') as prompt_file:
+            digest.update(prompt_file.read())
+    return digest.hexdigest()[:16]
+
+
+def canonical_article(article) -> dict:
+    """
+    Canonical form of a fetched or rewritten article, ignoring whitespace differences.
+    Forma canônica de um artigo buscado ou reescrito, ignorando diferenças de espaços.
+    """
+    return {
+        'url': canonical_url(article.get('url')),
+        'title': ' '.join((article.get('title') or '').split()),
+        'text': ' '.join((article.get('text') or article.get('content') or '').split()),
+    }
+
+
+def item_fingerprint(article) -> str:
+    """
+    Stable fingerprint of a single canonicalized article.
+    Impressão digital estável de um único artigo canonizado.
+    """
+    canonical = json.dumps(canonical_article(article), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def set_fingerprint(fingerprints) -> str:
+    """
+    Order-independent fingerprint of a set of article fingerprints.
+    Impressão digital independente de ordem de um conjunto de impressões de artigos.
+    """
+    return hashlib.sha256('\n'.join(sorted(set(fingerprints))).encode('utf-8')).hexdigest()[:32]
+
+
+def sequence_fingerprint(fingerprints) -> str:
+    """
+    Order-sensitive fingerprint of a list of article fingerprints, for results that refer to positions.
+    Impressão digital sensível à ordem de uma lista de impressões de artigos, para resultados que usam posições.
+    """
+    return hashlib.sha256(('ordered\n' + '\n'.join(fingerprints)).encode('utf-8')).hexdigest()[:32]
+
+
+class ResultCache:
+    """
+    Bounded on-disk cache of crew results keyed by an article-set fingerprint.
+    Entries live under a scope (e.g. topic, language, n_news) combined with the prompt
+    version, so editing the YAML prompts invalidates them. With partial_ratio set, a
+    lookup can return a cached result whose article set overlaps enough with the
+    requested one, together with the articles that still need processing; when the
+    result was stored with provenance, items built from articles no longer requested
+    are dropped and their remaining articles are processed again. With ordered set,
+    entries are keyed by the article order, for results holding article positions.
+    Least recently used entries are evicted when the size bound is exceeded.
+
+    Cache em disco limitado de resultados das equipes, indexado pela impressão digital
+    do conjunto de artigos. As entradas ficam sob um escopo (ex.: tópico, idioma, n_news)
+    combinado com a versão dos prompts, então editar os YAML os invalida. Com partial_ratio,
+    uma consulta pode retornar um resultado cujo conjunto de artigos coincide o suficiente
+    com o solicitado, junto com os artigos que ainda precisam ser processados; quando o
+    resultado foi armazenado com proveniência, itens criados a partir de artigos que não
+    foram mais solicitados são descartados e seus demais artigos são processados de novo.
+    Com ordered, as entradas são indexadas pela ordem dos artigos, para resultados com posições.
+    As entradas menos usadas são removidas quando o limite de tamanho é excedido.
+    """
+    def __init__(self, namespace, directory=None, max_bytes=None, partial_ratio=None, ordered=False):
+        directory = directory or os.environ.get('RESULT_CACHE_DIR', DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('RESULT_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.namespace = namespace
+        self.root = os.path.join(directory, namespace)
+        self.max_bytes = max_bytes
+        self.partial_ratio = None if ordered else partial_ratio
+        self.ordered = ordered
+        self.version = prompt_version()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def lookup(self, scope, articles):
+        """
+        Find a cached result for the articles.
+        Returns (value, missing_articles): value is None on a miss; missing_articles is
+        empty on an exact hit and lists the articles not covered on a partial hit.
+
+        Procura um resultado em cache para os artigos.
+        Retorna (value, missing_articles): value é None quando não encontrado; missing_articles
+        é vazio em um acerto exato e lista os artigos não cobertos em um acerto parcial.
+        """
+        fingerprints = [item_fingerprint(article) for article in articles]
+        scope_dir = self._scope_dir(scope)
+
+        entry = self._read(os.path.join(scope_dir, self._key(fingerprints) + '.json'))
+        if entry is not None:
+            self._count('hits')
+            return entry['value'], []
+
+        if self.partial_ratio is not None:
+            best = self._best_partial(scope_dir, set(fingerprints))
+            if best is not None:
+                entry = self._read(best[0])
+                if entry is not None:
+                    value, covered = self._reusable(entry, set(fingerprints))
+                    self._count('partial_hits')
+                    return value, [
+                        article for article, fingerprint in zip(articles, fingerprints) if fingerprint not in covered
+                    ]
+
+        self._count('misses')
+        return None, articles
+
+    def store(self, scope, articles, value, provenance=None):
+        """
+        Store a result for the articles and evict old entries if over the size bound.
+        `provenance`, for list values, gives for each item the indices of the articles it
+        was built from, or None when unknown; partial hits only reuse items whose articles
+        are all still requested.
+
+        Armazena um resultado para os artigos e remove entradas antigas se exceder o limite.
+        `provenance`, para valores em lista, informa para cada item os índices dos artigos
+        usados para criá-lo, ou None quando desconhecido; acertos parciais só reutilizam itens
+        cujos artigos ainda foram todos solicitados.
+        """
+        fingerprints = [item_fingerprint(article) for article in articles]
+        scope_dir = self._scope_dir(scope)
+        os.makedirs(scope_dir, exist_ok=True)
+        if provenance is not None:
+            provenance = [
+                None if sources is None else sorted({fingerprints[index] for index in sources})
+                for sources in provenance
+            ]
+
+        # Items go on the first line so partial matching can skip the provenance and value
+        # Os itens ficam na primeira linha para que a busca parcial ignore a proveniência e o valor
+        content = '\n'.join([
+            json.dumps(sorted(set(fingerprints))),
+            json.dumps(provenance),
+            json.dumps(value, ensure_ascii=False),
+        ])
+        handle, temp_path = tempfile.mkstemp(dir=scope_dir, suffix='.tmp')
+        with os.fdopen(handle, 'w', encoding='utf-8') as temp_file:
+            temp_file.write(content)
+        os.replace(temp_path, os.path.join(scope_dir, self._key(fingerprints) + '.json'))
+        self._evict()
+
+    def snapshot(self) -> dict:
+        """
+        Return hit, miss and eviction counters.
+        Retorna contadores de acertos, falhas e remoções.
+        """
+        with self._lock:
+            return {
+                'prompt_version': self.version,
+                'hits': self.hits,
+                'partial_hits': self.partial_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _key(self, fingerprints):
+        """
+        Entry name for a list of article fingerprints.
+        Nome da entrada para uma lista de impressões de artigos.
+        """
+        return sequence_fingerprint(fingerprints) if self.ordered else set_fingerprint(fingerprints)
+
+    @staticmethod
+    def _reusable(entry, requested):
+        """
+        Part of a partially matching entry that can be reused, and the requested articles it covers.
+        Items built from an article that is no longer requested, or of unknown origin, are
+        dropped and the articles they used count as not covered.
+
+        Parte de uma entrada com correspondência parcial que pode ser reutilizada e os artigos
+        solicitados que ela cobre. Itens criados a partir de um artigo que não foi mais solicitado,
+        ou de origem desconhecida, são descartados e os artigos usados por eles contam como não cobertos.
+        """
+        covered = set(entry['items']) & requested
+        if entry['provenance'] is None:
+            return entry['value'], covered
+
+        value, kept, dropped, unknown = [], set(), set(), False
+        for item, sources in zip(entry['value'], entry['provenance']):
+            if sources is not None and requested.issuperset(sources):
+                value.append(item)
+                kept.update(sources)
+            elif sources is None:
+                unknown = True
+            else:
+                dropped.update(sources)
+        if unknown:
+            # A dropped item of unknown origin may have used any article, so only the kept items' count as covered
+            # Um item descartado de origem desconhecida pode ter usado qualquer artigo, então só os dos itens mantidos contam
+            return value, kept
+        return value, covered - (dropped - kept)
+
+    def _scope_dir(self, scope):
+        """
+        Directory for a scope under the current prompt version.
+        Diretório de um escopo sob a versão atual dos prompts.
+        """
+        key = json.dumps([self.version] + [str(part) for part in scope], ensure_ascii=False)
+        return os.path.join(self.root, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32])
+
+    def _read(self, path):
+        """
+        Read an entry and mark it as recently used, or None if missing or unreadable.
+        Lê uma entrada e a marca como usada recentemente, ou None se ausente ou ilegível.
+        """
+        try:
+            with open(path, encoding='utf-8') as entry_file:
+                items = json.loads(entry_file.readline())
+                provenance = json.loads(entry_file.readline())
+                value = json.loads(entry_file.read())
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return {'items': items, 'provenance': provenance, 'value': value}
+
+    def _best_partial(self, scope_dir, fingerprints):
+        """
+        Path and overlap of the entry sharing the most articles, if above the partial ratio both ways.
+        Caminho e sobreposição da entrada com mais artigos em comum, se acima da proporção nos dois sentidos.
+        """
+        best = None
+        try:
+            names = os.listdir(scope_dir)
+        except OSError:
+            return None
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(scope_dir, name)
+            try:
+                with open(path, encoding='utf-8') as entry_file:
+                    cached = set(json.loads(entry_file.readline()))
+            except (OSError, ValueError):
+                continue
+            overlap = len(cached & fingerprints)
+            if (overlap >= self.partial_ratio * len(fingerprints) and overlap >= self.partial_ratio * len(cached)
+                    and (best is None or overlap > best[1])):
+                best = (path, overlap)
+        return best
+
+    def _evict(self):
+        """
+        Remove least recently used entries until the cache fits in max_bytes.
+        Remove as entradas menos usadas até o cache caber em max_bytes.
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for scope_dir, _, names in os.walk(self.root):
+                for name in names:
+                    if not name.endswith('.json'):
+                        continue
+                    path = os.path.join(scope_dir, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            entries.sort()
+            while total > self.max_bytes and entries:
+                _, size, path = entries.pop(0)
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                self.evictions += 1
+                if running_locally:
+                    print(f"Evicted {self.namespace} cache entry: {path}")
+
+    def _count(self, counter):
+        """
+        Increment a counter under the lock.
+        Incrementa um contador com o lock.
+        """
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
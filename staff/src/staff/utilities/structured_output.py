@@ -0,0 +1,300 @@
+import re
+from typing import Callable, Dict, List, Optional, Type
+from pydantic import BaseModel, ValidationError
+from globals import running_locally
+
+# Maximum targeted re-asks per parsed output
+# Máximo de novas perguntas direcionadas por saída interpretada
+MAX_REASKS = 5
+
+# Optional list markers and emphasis that models put around labels
+# Marcadores de lista e ênfase opcionais que os modelos colocam ao redor dos rótulos
+_LEADING = r'^\s*(?:(?:[-*>#]+|\d+[.)])\s*)*(?:\*\*|__)?\s*'
+_EMPHASIS = r'(?:\*\*|__)?'
+
+# First integer in a value, for drift like "2 (second article)" or "#3"
+# Primeiro inteiro de um valor, para desvios como "2 (segundo artigo)" ou "#3"
+_INTEGER = re.compile(r'-?\d+')
+
+
+def _label_regex(label):
+    """
+    Regex for a label that tolerates case, spaces instead of underscores and no separator.
+    Regex para um rótulo que tolera maiúsculas, espaços no lugar de sublinhados e ausência de separador.
+    """
+    return r'[\s_]*'.join(re.escape(part) for part in label.split('_'))
+
+
+def _strip_emphasis(value):
+    """
+    Value text without surrounding whitespace and a closing bold marker.
+    Texto do valor sem espaços ao redor e sem marcador de negrito de fechamento.
+    """
+    value = value.strip()
+    if value.endswith(('**', '__')):
+        value = value[:-2].rstrip()
+    return value
+
+
+def _label_like(label, prefix):
+    """
+    Whether a drifted label is written as a label rather than a sentence: joined by
+    underscores, capitalized on every word or preceded by emphasis.
+    Se um rótulo com desvio está escrito como rótulo e não como frase: unido por
+    sublinhados, com todas as palavras em maiúscula ou precedido por ênfase.
+    """
+    return '_' in label or all(word[0].isupper() for word in label.split()) or '**' in prefix or '__' in prefix
+
+
+def _normalize_label(label):
+    """
+    Canonical comparison form of a matched label.
+    Forma canônica de comparação de um rótulo encontrado.
+    """
+    return re.sub(r'[\s_]', '', label).upper()
+
+
+class ParsedRecord:
+    """
+    One record of a structured output: the raw field values, the validated value
+    (None while invalid), the names of missing or invalid fields and the source lines.
+
+    Um registro de uma saída estruturada: os valores brutos dos campos, o valor validado
+    (None enquanto inválido), os nomes dos campos ausentes ou inválidos e as linhas de origem.
+    """
+    __slots__ = ('data', 'value', 'errors', 'raw')
+
+    def __init__(self, data, raw):
+        self.data = data
+        self.raw = raw
+        self.value = None
+        self.errors = []
+
+
+class StructuredOutputParser:
+    """
+    Schema-driven parser for the LABEL: value text format produced by the crews.
+    Parses in a single pass over the lines, tolerating common drift (markdown bold or
+    list markers around labels, label case and spacing outside multiline fields, text
+    around integers, missing dividers), validates each record against a pydantic model and can repair invalid
+    records with a small targeted re-ask for just the missing or invalid fields.
+
+    Parser orientado a esquema para o formato de texto RÓTULO: valor produzido pelas equipes.
+    Interpreta em uma única passagem pelas linhas, tolerando desvios comuns (negrito ou
+    marcadores de lista ao redor dos rótulos, maiúsculas e espaços nos rótulos fora de
+    campos de várias linhas, texto ao redor de inteiros, divisores ausentes), valida cada registro com um modelo pydantic e
+    pode reparar registros inválidos com uma nova pergunta direcionada apenas aos campos
+    ausentes ou inválidos.
+
+    Parameters / Parâmetros:
+    - model: pydantic model used to validate each record / modelo pydantic usado para validar cada registro
+    - labels: mapping of output label to model field / mapeamento de rótulo da saída para campo do modelo
+    - hints: description of each label used in re-ask prompts / descrição de cada rótulo usada nas novas perguntas
+    - multiline: fields that continue on the following lines / campos que continuam nas linhas seguintes
+    - divider: text separating records, if any / texto que separa registros, se houver
+    - reaskable: fields a re-ask may fill, None for all; records with other invalid fields
+      are not re-asked / campos que uma nova pergunta pode preencher, None para todos;
+      registros com outros campos inválidos não recebem nova pergunta
+    """
+    def __init__(self, model: Type[BaseModel], labels: Dict[str, str], hints: Dict[str, str],
+                 multiline=(), divider: Optional[str] = None, reaskable=None):
+        self.model = model
+        self.labels = labels
+        self.hints = hints
+        self.multiline = set(multiline)
+        self.reaskable = set(reaskable) if reaskable is not None else set(labels.values())
+        self.fields_to_labels = {field: label for label, field in labels.items()}
+        self.int_fields = {name for name, info in model.model_fields.items() if info.annotation is int}
+
+        self._by_label = {_normalize_label(label): field for label, field in labels.items()}
+        alternatives = '|'.join(_label_regex(label) for label in sorted(labels, key=len, reverse=True))
+        self._line = re.compile(
+            _LEADING + r'(?P<label>' + alternatives + r')\s*' + _EMPHASIS + r'\s*[:：]\s*' + _EMPHASIS + r'\s*',
+            re.IGNORECASE
+        )
+        # Inside a multiline field canonical labels end it, and so do drifted forms of the
+        # labels expected next (the following one, or the first when the divider is missing)
+        # unless written like a sentence, so body text such as "Original source: Reuters"
+        # stays in the content
+        # Dentro de um campo de várias linhas rótulos canônicos o encerram, assim como formas
+        # com desvio dos rótulos esperados em seguida (o próximo, ou o primeiro quando falta o
+        # divisor), exceto quando escritas como frase, então texto como "Original source: Reuters"
+        # permanece no conteúdo
+        self._strict_line = re.compile(
+            _LEADING + r'(?P<label>' + '|'.join(re.escape(label) for label in sorted(labels, key=len, reverse=True)) + r')' + _EMPHASIS + r'\s*[:：]\s*' + _EMPHASIS + r'\s*'
+        )
+        order = list(labels)
+        self._next_line = {}
+        for index, label in enumerate(order):
+            if labels[label] in self.multiline:
+                expected = {order[(index + 1) % len(order)], order[0]}
+                self._next_line[labels[label]] = re.compile(
+                    _LEADING + r'(?P<label>' + '|'.join(_label_regex(name) for name in expected) + r')\s*' + _EMPHASIS + r'\s*[:：]\s*' + _EMPHASIS + r'\s*',
+                    re.IGNORECASE
+                )
+        self._divider = None
+        self._divider_word = None
+        if divider:
+            words = divider.strip('-').split()
+            self._divider_word = words[-1]
+            self._divider = re.compile(r'[-=*_]*\s*' + _label_regex('_'.join(words)) + r'\s*[-=*_]*')
+
+    def parse(self, text: str, context: Optional[dict] = None) -> List[ParsedRecord]:
+        """
+        Parse and validate every record in the text.
+        Interpreta e valida todos os registros do texto.
+        """
+        records = self._parse_lines(text)
+        for record in records:
+            self._validate(record, context)
+        return records
+
+    def repair(self, records: List[ParsedRecord], complete: Callable[[str], str],
+               context: Optional[dict] = None, instructions: str = '') -> List[ParsedRecord]:
+        """
+        Re-ask only the missing or invalid fields of invalid records, up to MAX_REASKS calls.
+        Records with an invalid field outside `reaskable` are left invalid.
+        `complete(prompt)` must return the model's text answer.
+
+        Pergunta novamente apenas os campos ausentes ou inválidos dos registros inválidos,
+        até MAX_REASKS chamadas. Registros com um campo inválido fora de `reaskable` continuam
+        inválidos. `complete(prompt)` deve retornar a resposta em texto do modelo.
+        """
+        reasks = 0
+        for record in records:
+            if record.value is not None or reasks >= MAX_REASKS or not self.reaskable.issuperset(record.errors):
+                continue
+            reasks += 1
+            fields = list(record.errors)
+            try:
+                answer = complete(self._reask_prompt(record, instructions))
+            except Exception as e:
+                if running_locally:
+                    print(f"Re-ask failed: {e}")
+                continue
+
+            fixes = self._parse_lines(answer)
+            if fixes:
+                for field in fields:
+                    if field in fixes[0].data:
+                        record.data[field] = fixes[0].data[field]
+                self._validate(record, context)
+            if running_locally:
+                print(f"Re-asked {fields}: {'fixed' if record.value is not None else 'still invalid'}.")
+        return records
+
+    def partial(self, record: ParsedRecord) -> dict:
+        """
+        Fields of an invalid record that are not themselves missing or invalid.
+        Campos de um registro inválido que não estão ausentes nem inválidos.
+        """
+        data = self._coerce(record.data)
+        return {field: value for field, value in data.items() if field not in record.errors}
+
+    def _parse_lines(self, text: str) -> List[ParsedRecord]:
+        """
+        Single pass over the lines of the text. A divider or a repeated label starts a new record.
+        Passagem única pelas linhas do texto. Um divisor ou um rótulo repetido inicia um novo registro.
+        """
+        records = []
+        data, parts, raw = {}, {}, []
+        collecting, collecting_field = None, None
+
+        def close():
+            nonlocal data, parts, raw, collecting, collecting_field
+            if data:
+                for field, lines in parts.items():
+                    data[field] = '\n'.join(lines).rstrip()
+                records.append(ParsedRecord(data, '\n'.join(raw)))
+            data, parts, raw, collecting, collecting_field = {}, {}, [], None, None
+
+        def feed(line):
+            nonlocal collecting, collecting_field
+            # Cheap separator check before running the label regex
+            # Verificação barata do separador antes de executar a regex de rótulo
+            match = None
+            if ':' in line or '：' in line:
+                if collecting is None:
+                    match = self._line.match(line)
+                else:
+                    match = self._strict_line.match(line)
+                    if match is None:
+                        match = self._next_line[collecting_field].match(line)
+                        if match is not None and not _label_like(match.group('label'), line[:match.start('label')]):
+                            match = None
+            if match:
+                field = self._by_label[_normalize_label(match.group('label'))]
+                if field in data:
+                    close()
+                value = _strip_emphasis(line[match.end():])
+                data[field] = value
+                collecting, collecting_field = None, None
+                if field in self.multiline:
+                    collecting, collecting_field = [value], field
+                    parts[field] = collecting
+            elif collecting is not None:
+                collecting.append(line)
+            raw.append(line)
+
+        divider_word = self._divider_word
+        for line in text.split('\n'):
+            if divider_word is not None and divider_word in line:
+                found = self._divider.search(line)
+                if found is not None:
+                    before, after = line[:found.start()], line[found.end():]
+                    if before.strip(' *_-='):
+                        feed(before)
+                    close()
+                    if after.strip(' *_-='):
+                        feed(after)
+                    continue
+            # Fast path for plain lines of a multiline field
+            # Caminho rápido para linhas simples de um campo de várias linhas
+            if collecting is not None and ':' not in line and '：' not in line:
+                collecting.append(line)
+                raw.append(line)
+                continue
+            feed(line)
+        close()
+        return records
+
+    def _validate(self, record: ParsedRecord, context: Optional[dict]):
+        """
+        Coerce integer fields and validate the record against the model.
+        Converte campos inteiros e valida o registro com o modelo.
+        """
+        try:
+            record.value = self.model.model_validate(self._coerce(record.data), context=context).model_dump()
+            record.errors = []
+        except ValidationError as e:
+            record.value = None
+            record.errors = sorted({str(error['loc'][0]) for error in e.errors() if error['loc']})
+
+    def _coerce(self, data: dict) -> dict:
+        """
+        Copy of the raw fields with integer fields reduced to their first integer.
+        Cópia dos campos brutos com os campos inteiros reduzidos ao primeiro inteiro.
+        """
+        data = dict(data)
+        for field in self.int_fields & data.keys():
+            found = _INTEGER.search(str(data[field]))
+            if found:
+                data[field] = int(found.group())
+        return data
+
+    def _reask_prompt(self, record: ParsedRecord, instructions: str) -> str:
+        """
+        Prompt asking only for the record's missing or invalid fields.
+        Prompt pedindo apenas os campos ausentes ou inválidos do registro.
+        """
+        lines = '\n'.join(
+            f"{self.fields_to_labels[field]}: {self.hints[self.fields_to_labels[field]]}"
+            for field in record.errors if field in self.fields_to_labels
+        )
+        return (
+            "Part of a structured answer is missing or invalid. Fix only the fields listed below.\n\n"
+            f"Answer:\n{record.raw}\n\n"
+            f"{instructions}\n\n"
+            "Return only these lines, in plain text, nothing else:\n"
+            f"{lines}"
+        )
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app modules import each other from the staff source directory, as in production
+# Os módulos do app se importam a partir do diretório de código do staff, como em produção
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'staff'))
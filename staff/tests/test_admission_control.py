@@ -0,0 +1,162 @@
+import socket
+import threading
+import time
+from flask import Flask
+from utilities.admission_control import AdmissionController
+
+
+def test_disconnect_detected_while_queued_with_large_body():
+    """
+    A queued client that sent a body larger than gunicorn's initial read and then
+    closed its connection is dropped with 499 instead of waiting for a slot.
+    """
+    app = Flask(__name__)
+    admission = AdmissionController(limits={'rewrite': (1, 2, 1.0)}, capacity=4)
+    release = threading.Event()
+
+    @admission.limit('rewrite')
+    def view():
+        release.wait(10)
+        return 'done'
+
+    # Hold the only rewrite slot
+    def hold_slot():
+        with app.test_request_context('/', method='POST'):
+            view()
+    busy = threading.Thread(target=hold_slot)
+    busy.start()
+    time.sleep(0.2)
+
+    # Simulate gunicorn: the body is still unread on the connection socket
+    server, client = socket.socketpair()
+    body = b'x' * 64 * 1024
+    sender = threading.Thread(target=lambda: (client.sendall(body), client.close()))
+    sender.start()
+
+    started = time.monotonic()
+    try:
+        with app.test_request_context('/', method='POST', environ_overrides={
+            'wsgi.input': server.makefile('rb'),
+            'CONTENT_LENGTH': str(len(body)),
+            'gunicorn.socket': server,
+        }):
+            result = view()
+    finally:
+        release.set()
+        busy.join()
+        sender.join()
+        server.close()
+
+    assert result[1] == 499
+    assert time.monotonic() - started < 5
+    assert admission.snapshot()['stages']['rewrite']['abandoned'] == 1
+
+
+def _occupy(app, view, count):
+    """Start `count` requests that hold their slot until the view's event is set."""
+    threads = []
+    for _ in range(count):
+        def run():
+            with app.test_request_context('/', method='POST'):
+                view()
+        thread = threading.Thread(target=run)
+        thread.start()
+        threads.append(thread)
+    time.sleep(0.2)
+    return threads
+
+
+def test_full_queue_is_shed_with_retry_after():
+    app = Flask(__name__)
+    admission = AdmissionController(limits={'cover': (1, 1, 30.0)}, capacity=8)
+    release = threading.Event()
+
+    @admission.limit('cover')
+    def view():
+        release.wait(10)
+        return 'done'
+
+    threads = _occupy(app, view, 2)  # one running, one queued
+    with app.test_request_context('/', method='POST'):
+        response, status = view()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert status == 429
+    # 30 s latency, one queued ahead, one slot: (1 + 1) * 30 / 1
+    assert response.headers['Retry-After'] == '60'
+    assert admission.snapshot()['stages']['cover']['shed'] == 1
+
+
+def test_request_that_cannot_meet_its_deadline_is_shed():
+    app = Flask(__name__)
+    admission = AdmissionController(limits={'rewrite': (1, 4, 120.0)}, capacity=8)
+    release = threading.Event()
+
+    @admission.limit('rewrite')
+    def view():
+        release.wait(10)
+        return 'done'
+
+    threads = _occupy(app, view, 1)
+    with app.test_request_context('/', method='POST', headers={'X-Request-Timeout': '5'}):
+        _, status = view()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert status == 429
+
+
+def test_queue_is_served_earliest_deadline_first():
+    app = Flask(__name__)
+    admission = AdmissionController(limits={'image': (1, 4, 0.1)}, capacity=8)
+    release = threading.Event()
+    order = []
+
+    @admission.limit('image')
+    def view(name):
+        if name == 'blocker':
+            release.wait(10)
+        order.append(name)
+        return 'done'
+
+    def run(name, timeout):
+        headers = {'X-Request-Timeout': timeout} if timeout else {}
+        with app.test_request_context('/', method='POST', headers=headers):
+            view(name)
+
+    threads = [threading.Thread(target=run, args=('blocker', None))]
+    threads[0].start()
+    time.sleep(0.2)
+    for name, timeout in [('no deadline', None), ('late', '60'), ('early', '30')]:
+        thread = threading.Thread(target=run, args=(name, timeout))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert order == ['blocker', 'early', 'late', 'no deadline']
+
+
+def test_latency_ignores_errors_and_skipped_requests():
+    app = Flask(__name__)
+    admission = AdmissionController(limits={'rewrite': (2, 2, 120.0)}, capacity=8)
+
+    @admission.limit('rewrite')
+    def view(kind):
+        if kind == 'error':
+            return 'bad', 400
+        if kind == 'cached':
+            admission.skip_latency()
+        return 'done'
+
+    for kind in ['error', 'cached', 'error', 'cached']:
+        with app.test_request_context('/', method='POST'):
+            view(kind)
+    assert admission.snapshot()['stages']['rewrite']['latency_seconds'] == 120.0
+
+    with app.test_request_context('/', method='POST'):
+        view('work')
+    assert admission.snapshot()['stages']['rewrite']['latency_seconds'] < 120.0
@@ -0,0 +1,46 @@
+from utilities.cover_digest import CHARS_PER_TOKEN, ENTRY_OVERHEAD, build_cover_digest, lead_sentences
+
+
+def article(index, sentences=20):
+    content = ' '.join(f'Sentence {number} of story {index} goes here.' for number in range(sentences))
+    return {'title': f'Story {index}', 'content': content, 'source': f'site{index}.com'}
+
+
+def leads(digest):
+    return [line[len('LEAD:'):] for line in digest.split('\n') if line.startswith('LEAD:')]
+
+
+def test_lead_keeps_whole_sentences_that_fit():
+    content = 'First one.\nSecond one! Third one is longer than the rest?'
+    assert lead_sentences(content, 25) == 'First one. Second one!'
+    assert lead_sentences(content, 200) == 'First one. Second one! Third one is longer than the rest?'
+
+
+def test_lead_cuts_a_long_first_sentence_at_a_word_boundary():
+    lead = lead_sentences('An opening sentence that runs far past the budget.', 20)
+    assert lead == 'An opening sentence…'
+    assert len(lead) <= 21
+
+
+def test_budget_is_split_evenly_across_articles():
+    articles = [article(index) for index in range(4)]
+    digest = build_cover_digest(articles, token_budget=400)
+
+    per_article_chars = 400 * CHARS_PER_TOKEN // len(articles)
+    assert [line for line in digest.split('\n') if line.startswith('INDEX:')] == [f'INDEX:{index}' for index in range(4)]
+    for index, lead in enumerate(leads(digest)):
+        assert lead.startswith(f'Sentence 0 of story {index}')
+        assert len(lead) <= per_article_chars - len(f'Story {index}') - ENTRY_OVERHEAD
+    assert len(digest) <= 400 * CHARS_PER_TOKEN
+
+
+def test_lead_never_drops_below_the_floor():
+    articles = [article(index) for index in range(10)]
+    digest = build_cover_digest(articles, token_budget=10)
+    for lead in leads(digest):
+        assert 0 < len(lead) <= CHARS_PER_TOKEN * 20
+        assert lead.startswith('Sentence 0')
+
+
+def test_empty_input_gives_an_empty_digest():
+    assert build_cover_digest([], token_budget=100) == ''
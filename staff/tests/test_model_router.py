@@ -0,0 +1,80 @@
+import pytest
+from utilities import model_router
+from utilities.model_router import ModelRouter
+
+CONFIG = """
+rewrite:
+  slo_seconds: 10
+  short_input_chars: 100
+  tiers:
+    '1': [fast, strong]
+    '7': [strong, fast]
+image:
+  slo_seconds: 10
+  short_input_chars: 0
+  tiers:
+    '1': [only]
+"""
+
+
+@pytest.fixture
+def router(tmp_path):
+    path = tmp_path / 'models.yaml'
+    path.write_text(CONFIG)
+    return ModelRouter(str(path))
+
+
+def test_tier_and_short_input(router):
+    assert router.choose('rewrite', '7')['model'] == 'strong'
+    assert router.choose('rewrite', '7', input_chars=50)['model'] == 'fast'
+    assert router.choose('rewrite', '7', input_chars=500)['model'] == 'strong'
+    assert router.choose('rewrite', 'unknown')['tier'] == '1'
+
+
+def test_slo_fallback(router):
+    for _ in range(model_router.MIN_SAMPLES):
+        router.record('rewrite', 'strong', 30.0, True)
+    decision = router.choose('rewrite', '7')
+    assert (decision['model'], decision['reason'], decision['fallback_from']) == ('fast', 'p95_over_slo', 'strong')
+
+
+def test_error_rate_fallback(router):
+    for _ in range(model_router.MIN_SAMPLES):
+        router.record('rewrite', 'strong', 1.0, False)
+    decision = router.choose('rewrite', '7')
+    assert (decision['model'], decision['reason']) == ('fast', 'error_rate')
+
+
+def test_failed_call_is_retried_on_next_candidate(router):
+    calls = []
+
+    def call(model):
+        calls.append(model)
+        if model == 'strong':
+            raise RuntimeError('unavailable')
+        return 'ok'
+
+    result, decision = router.run('rewrite', '7', call)
+    assert result == 'ok' and calls == ['strong', 'fast']
+    assert (decision['model'], decision['reason'], decision['fallback_from']) == ('fast', 'error', 'strong')
+    assert router.snapshot()['models']['rewrite']['strong']['error_rate'] == 1.0
+
+
+def test_failure_without_other_candidate_is_raised(router):
+    def call(model):
+        raise RuntimeError('unavailable')
+
+    with pytest.raises(RuntimeError):
+        router.run('image', '1', call)
+
+
+def test_retry_failure_is_raised(router):
+    calls = []
+
+    def call(model):
+        calls.append(model)
+        raise RuntimeError('unavailable')
+
+    with pytest.raises(RuntimeError):
+        router.run('rewrite', '7', call)
+    assert calls == ['strong', 'fast']
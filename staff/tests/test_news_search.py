@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from utilities.news_search import canonical_url, date_windows, rank_results
+
+
+def result(url, title=None):
+    return SimpleNamespace(url=url, title=title or url)
+
+
+def test_canonical_url_keeps_identifying_query():
+    assert canonical_url('https://news.com/article?id=1') != canonical_url('https://news.com/article?id=2')
+    assert canonical_url('https://www.News.com/a/?b=2&a=1#top') == canonical_url('http://news.com/a?a=1&b=2')
+    assert canonical_url('https://news.com/a?id=1&utm_source=x&fbclid=y') == canonical_url('https://news.com/a?id=1')
+
+
+def test_date_windows_split_the_period_newest_first():
+    now = datetime(2026, 1, 31)
+    windows = date_windows(30, now)
+    assert len(windows) == 3
+    assert windows[0][1] == now and windows[-1][0] == now - timedelta(days=30)
+    assert all(earlier[0] == later[1] for earlier, later in zip(windows, windows[1:]))
+    assert len(date_windows(1, now)) == 1
+
+
+def test_rank_results_interleaves_and_deduplicates():
+    first = [result('https://a.com/1'), result('https://b.com/1', 'Same story')]
+    second = [result('https://c.com/1'), result('https://www.a.com/1/?utm_source=feed'), result('https://d.com/1', 'same  story')]
+    ranked = rank_results([first, second], 10)
+    assert [item.url for item in ranked] == ['https://a.com/1', 'https://c.com/1', 'https://b.com/1']
+
+
+def test_rank_results_caps_domains_then_fills_and_keeps_replacements():
+    results = [result(f'https://big.com/{index}') for index in range(6)] + [result('https://small.com/1')]
+    ranked = rank_results([results], 4)
+    # One per domain for n_news=4 in the first pass, then fill with the best remaining
+    assert [item.url for item in ranked[:4]] == ['https://big.com/0', 'https://small.com/1', 'https://big.com/1', 'https://big.com/2']
+    assert len(ranked) == 7
@@ -0,0 +1,65 @@
+import time
+from utilities.prewarm import PrewarmStore
+
+
+def test_max_age_ignores_older_values_without_dropping_them():
+    store = PrewarmStore()
+    store.put('articles', [1, 2], ttl=60)
+    assert store.get('articles', max_age=30) == [1, 2]
+
+    time.sleep(0.05)
+    assert store.get('articles', max_age=0.01) is None
+    assert store.get('articles') == [1, 2]
+
+
+def test_expired_values_are_dropped():
+    store = PrewarmStore()
+    store.put('image', 'data', ttl=0)
+    time.sleep(0.01)
+    assert store.get('image') is None
+    assert store.snapshot()['entries'] == 0
+
+
+def test_background_slot_counts_against_live_capacity():
+    from flask import Flask
+    from utilities.admission_control import AdmissionController
+
+    app = Flask(__name__)
+    admission = AdmissionController(limits={'rewrite': (2, 0, 1.0)}, capacity=2)
+
+    @admission.limit('rewrite')
+    def view():
+        return 'done'
+
+    assert admission.reserve_background()
+
+    # One background slot left one live slot: a second concurrent request is shed
+    with app.test_request_context('/', method='POST'):
+        assert admission._acquire('rewrite', None) is None
+        _, status = admission._acquire('rewrite', None)
+    assert status == 429
+    assert admission.idle() is False
+
+    admission.release_background()
+    assert admission.snapshot()['background'] == 0
+
+
+def test_prewarmer_holds_a_background_slot_while_warming():
+    from utilities.admission_control import AdmissionController
+    from utilities.prewarm import Prewarmer, RequestHistory
+
+    admission = AdmissionController(limits={'rewrite': (2, 2, 1.0)}, capacity=4)
+    history = RequestHistory()
+    for _ in range(3):
+        history.record('AI', 'en', '1')
+    seen = []
+
+    def warm(topic, language, coins, proceed):
+        seen.append((admission.snapshot()['background'], admission.idle(), proceed('rewrite')))
+        return True
+
+    prewarmer = Prewarmer(history, admission, warm)
+    prewarmer.run_once()
+    assert seen == [(1, True, True)]
+    assert admission.snapshot()['background'] == 0
+    assert prewarmer.snapshot()['warmed'] == 1
@@ -0,0 +1,39 @@
+import gzip
+import brotli
+import pytest
+from flask import Flask
+from utilities.response_encoding import ResponseEncoder, RequestBodyError
+
+app = Flask(__name__)
+
+
+def read(body, encoding, max_request_size=1024 * 1024):
+    encoder = ResponseEncoder(max_request_size=max_request_size)
+    with app.test_request_context('/', method='POST', data=body, headers={'Content-Encoding': encoding}):
+        return encoder.read_json()
+
+
+@pytest.mark.parametrize('encoding, compress', [('gzip', gzip.compress), ('br', brotli.compress)])
+def test_compressed_body(encoding, compress):
+    assert read(compress(b'{"process_data": {"topic": "ai"}}'), encoding) == {'process_data': {'topic': 'ai'}}
+
+
+@pytest.mark.parametrize('encoding, compress', [('gzip', gzip.compress), ('br', brotli.compress)])
+def test_expansion_past_limit_is_refused(encoding, compress):
+    bomb = compress(b'0' * 64 * 1024 * 1024)
+    with pytest.raises(RequestBodyError) as error:
+        read(bomb, encoding)
+    assert error.value.status == 413
+
+
+@pytest.mark.parametrize('body, encoding, status', [
+    (b'not compressed', 'br', 400),
+    (b'not compressed', 'gzip', 400),
+    (b'{"broken": ', 'identity', 400),
+    (b'[1, 2]', 'identity', 400),
+    (b'{}', 'compress', 415),
+])
+def test_undecodable_body(body, encoding, status):
+    with pytest.raises(RequestBodyError) as error:
+        read(body, encoding)
+    assert error.value.status == status
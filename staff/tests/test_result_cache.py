@@ -0,0 +1,47 @@
+from utilities.process_rewritten_article import credited_articles
+from utilities.result_cache import ResultCache
+
+ARTICLES = [
+    {'url': f'https://site{index}.com/story', 'title': f'Story {index}', 'text': f'Text {index}', 'source': f'site{index}.com'}
+    for index in range(8)
+]
+
+
+def test_ordered_cache_misses_on_reordered_articles(tmp_path):
+    cache = ResultCache('cover', directory=str(tmp_path), ordered=True)
+    cache.store(('topic', 'en'), ARTICLES[:3], {'main_article_index': 0})
+    assert cache.lookup(('topic', 'en'), ARTICLES[:3]) == ({'main_article_index': 0}, [])
+    assert cache.lookup(('topic', 'en'), ARTICLES[2::-1])[0] is None
+
+
+def test_partial_hit_drops_rewrites_of_removed_articles(tmp_path):
+    cache = ResultCache('rewrite', directory=str(tmp_path), partial_ratio=0.75)
+    rewrites = [
+        {'title': 'A', 'content': 'a', 'source': 'site0.com - Story 0;site1.com - Story 1'},
+        {'title': 'B', 'content': 'b', 'source': 'site2.com - Story 2;site7.com - Story 7'},
+        {'title': 'C', 'content': 'c', 'source': 'site3.com - Story 3'},
+    ]
+    provenance = [credited_articles(rewrite, ARTICLES) for rewrite in rewrites]
+    assert provenance == [[0, 1], [2, 7], [3]]
+    cache.store(('topic', 'en', 8), ARTICLES, rewrites, provenance)
+
+    # Article 7 is gone and article 8 is new: B is dropped and article 2 is rewritten again
+    requested = ARTICLES[:7] + [{'url': 'https://new.com/x', 'title': 'New', 'text': 'New', 'source': 'new.com'}]
+    value, missing = cache.lookup(('topic', 'en', 8), requested)
+    assert [rewrite['title'] for rewrite in value] == ['A', 'C']
+    assert [article['title'] for article in missing] == ['Story 2', 'New']
+
+
+def test_unattributed_rewrite_is_not_reused(tmp_path):
+    cache = ResultCache('rewrite', directory=str(tmp_path), partial_ratio=0.75)
+    rewrites = [
+        {'title': 'A', 'content': 'a', 'source': 'site0.com - Story 0'},
+        {'title': 'X', 'content': 'x', 'source': 'unknown.com - Elsewhere'},
+    ]
+    provenance = [credited_articles(rewrite, ARTICLES) for rewrite in rewrites]
+    assert provenance == [[0], None]
+    cache.store(('topic', 'en', 8), ARTICLES, rewrites, provenance)
+
+    value, missing = cache.lookup(('topic', 'en', 8), ARTICLES[:7])
+    assert [rewrite['title'] for rewrite in value] == ['A']
+    assert len(missing) == 6
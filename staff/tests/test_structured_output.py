@@ -0,0 +1,120 @@
+from utilities.process_cover_content import process_cover_content
+from utilities.process_rewritten_article import process_rewritten_article
+
+COVER = """MAIN_HEADLINE: Orbit
+SUBHEADING: A new race to space
+MAIN_ARTICLE_INDEX: 0
+SUMMARY1_INDEX: 1
+SUMMARY1: Chips get smaller.
+SUMMARY2_INDEX: 2
+SUMMARY2: Rain returns.
+"""
+
+
+def test_canonical_articles():
+    result = (
+        "NEW_TITLE: First\nNEW_CONTENT: Line one.\n\nLine two.\nORIGINAL_SOURCE: a.com - A\n---ARTICLE DIVIDER---\n"
+        "NEW_TITLE: Second\nNEW_CONTENT: Body.\nORIGINAL_SOURCE: b.com - B\n---ARTICLE DIVIDER---\n"
+    )
+    assert process_rewritten_article(result) == [
+        {'title': 'First', 'content': 'Line one.\n\nLine two.', 'source': 'a.com - A'},
+        {'title': 'Second', 'content': 'Body.', 'source': 'b.com - B'},
+    ]
+
+
+def test_bold_and_list_marker_labels():
+    result = "**NEW_TITLE:** Bold\n- **NEW_CONTENT:** Body text.**\n1. ORIGINAL_SOURCE: a.com - A\n**---ARTICLE DIVIDER---**\n"
+    assert process_rewritten_article(result) == [{'title': 'Bold', 'content': 'Body text.', 'source': 'a.com - A'}]
+
+
+def test_label_case_and_spacing_outside_content():
+    result = "New Title: Spaced\nnew_content: Body.\nORIGINAL_SOURCE: a.com - A\n"
+    assert process_rewritten_article(result) == [{'title': 'Spaced', 'content': 'Body.', 'source': 'a.com - A'}]
+
+
+def test_label_like_body_lines_stay_in_content():
+    result = (
+        "NEW_TITLE: Hello\n"
+        "NEW_CONTENT: The council met on Monday.\n"
+        "New title: the mayor said the plan was final.\n"
+        "Original source: Reuters, according to officials.\n"
+        "ORIGINAL_SOURCE: a.com - A\n"
+        "---ARTICLE DIVIDER---\n"
+    )
+    assert process_rewritten_article(result) == [{
+        'title': 'Hello',
+        'content': 'The council met on Monday.\nNew title: the mayor said the plan was final.\n'
+                   'Original source: Reuters, according to officials.',
+        'source': 'a.com - A',
+    }]
+
+
+def test_missing_divider_splits_on_repeated_label():
+    result = "NEW_TITLE: One\nNEW_CONTENT: A.\nORIGINAL_SOURCE: a.com\nNEW_TITLE: Two\nNEW_CONTENT: B.\nORIGINAL_SOURCE: b.com\n"
+    assert [article['title'] for article in process_rewritten_article(result)] == ['One', 'Two']
+
+
+def test_missing_content_is_dropped_without_reask():
+    calls = []
+
+    def complete(prompt):
+        calls.append(prompt)
+        return "NEW_CONTENT: Invented story."
+
+    assert process_rewritten_article("NEW_TITLE: Only title\nORIGINAL_SOURCE: x.com", complete=complete) == []
+    assert calls == []
+
+
+def test_missing_title_is_reasked_from_content():
+    calls = []
+
+    def complete(prompt):
+        calls.append(prompt)
+        return "NEW_TITLE: Derived"
+
+    articles = process_rewritten_article("NEW_CONTENT: Body.\nORIGINAL_SOURCE: x.com", complete=complete)
+    assert articles == [{'title': 'Derived', 'content': 'Body.', 'source': 'x.com'}]
+    assert len(calls) == 1 and 'NEW_CONTENT' not in calls[0].split('nothing else:')[1]
+
+
+def test_cover_canonical():
+    assert process_cover_content(COVER, n_articles=3) == {
+        'main_headline': 'Orbit', 'subheading': 'A new race to space', 'main_article_index': 0,
+        'summary1_index': 1, 'summary1': 'Chips get smaller.', 'summary2_index': 2, 'summary2': 'Rain returns.',
+    }
+
+
+def test_cover_index_drift():
+    drifted = COVER.replace('MAIN_ARTICLE_INDEX: 0', '**Main Article Index:** 0 (first article)')
+    drifted = drifted.replace('SUMMARY1_INDEX: 1', 'SUMMARY1_INDEX: #1')
+    cover = process_cover_content(drifted, n_articles=3)
+    assert (cover['main_article_index'], cover['summary1_index']) == (0, 1)
+
+
+def test_cover_out_of_range_index_is_left_out():
+    cover = process_cover_content(COVER.replace('SUMMARY2_INDEX: 2', 'SUMMARY2_INDEX: 7'), n_articles=3)
+    assert 'summary2_index' not in cover
+    assert cover['summary2'] == 'Rain returns.'
+
+
+def test_drifted_source_label_ends_content():
+    for label in ('Original Source:', '**Original_Source:**', 'ORIGINAL SOURCE:', '- original_source:'):
+        result = f"NEW_TITLE: Hello\nNEW_CONTENT: Body.\n{label} a.com - A\n"
+        assert process_rewritten_article(result) == [{'title': 'Hello', 'content': 'Body.', 'source': 'a.com - A'}], label
+
+
+def test_drifted_title_label_after_content_starts_next_article():
+    result = "NEW_TITLE: One\nNEW_CONTENT: A.\nORIGINAL_SOURCE: a.com\nNew Title: Two\nNEW_CONTENT: B.\nORIGINAL_SOURCE: b.com\n"
+    assert [article['title'] for article in process_rewritten_article(result)] == ['One', 'Two']
+
+
+def test_missing_source_is_reasked_with_original_articles():
+    calls = []
+
+    def complete(prompt):
+        calls.append(prompt)
+        return "ORIGINAL_SOURCE: a.com - A"
+
+    articles = process_rewritten_article("NEW_TITLE: Hello\nNEW_CONTENT: Body.", complete=complete, sources='a.com - A')
+    assert articles == [{'title': 'Hello', 'content': 'Body.', 'source': 'a.com - A'}]
+    assert len(calls) == 1 and 'a.com - A' in calls[0]